@@ -0,0 +1,102 @@
+"""
+Structured results for ElasticSearch bulk requests.
+
+A bulk response can contain a mixture of successful and failed items, and
+the failures are not all equal. Some are caused by temporary conditions on
+the cluster (e.g. a full thread pool rejecting the request) and are worth
+sending again, while others (e.g. a mapping error) will fail every time.
+
+"""
+
+import pyelasticsearch
+
+
+# Response statuses which indicate a temporary problem.
+RETRYABLE_STATUSES = (429, 503, 504)
+
+# Error names which indicate a temporary problem.
+RETRYABLE_ERRORS = (
+    'EsRejectedExecutionException',
+    'ProcessClusterEventTimeoutException',
+    'ReceiveTimeoutTransportException',
+    'TimeoutException',
+    'UnavailableShardsException',
+)
+
+
+class BulkError(pyelasticsearch.ElasticSearchError):
+    """Raised when bulk items could not be processed after retrying."""
+
+    def __init__(self, message, items):
+        super(BulkError, self).__init__(message)
+        self.items = items
+
+
+class BulkItem(object):
+    """The result of one action in a bulk request."""
+
+    def __init__(self, position, action, data):
+        self.position = position
+        self.action = action
+        self.doc_id = data.get('_id')
+        self.index = data.get('_index')
+        self.status = data.get('status')
+        self.error = data.get('error')
+
+    def __repr__(self):
+        return '<BulkItem %s %s: %s>' % (self.action, self.doc_id, self.error or self.status)
+
+    @property
+    def conflict(self):
+        """
+        A create action for a document which already exists. These are used
+        when an existing document should be kept, so they are not failures.
+
+        """
+        return self.action == 'create' and self.status == 409
+
+    @property
+    def failed(self):
+        return bool(self.error) and not self.conflict
+
+    @property
+    def retryable(self):
+        if not self.failed:
+            return False
+        if self.status in RETRYABLE_STATUSES:
+            return True
+        error = unicode(self.error)
+        for name in RETRYABLE_ERRORS:
+            if name in error:
+                return True
+        return False
+
+
+class BulkResult(object):
+    """The results of a bulk request, sorted into successes and failures."""
+
+    def __init__(self, response_data):
+        self.took = response_data.get('took')
+        self.items = []
+        for position, item in enumerate(response_data.get('items') or []):
+            for action, data in item.items():
+                self.items.append(BulkItem(position, action, data))
+
+    def __repr__(self):
+        return '<BulkResult: %d succeeded, %d retryable, %d permanent>' % (
+            len(self.succeeded),
+            len(self.retryable),
+            len(self.permanent),
+        )
+
+    @property
+    def succeeded(self):
+        return [item for item in self.items if not item.failed]
+
+    @property
+    def retryable(self):
+        return [item for item in self.items if item.retryable]
+
+    @property
+    def permanent(self):
+        return [item for item in self.items if item.failed and not item.retryable]
@@ -0,0 +1,126 @@
+"""
+Deduplicates identical searches within one request or task.
+
+Template includes and inclusion tags often run the same search more than
+once while rendering a page. While deduplication is active, the response
+of each distinct search is remembered and reused for its duplicates.
+
+Activating it:
+    with search_deduplication('rebuild sitemap'):
+        build_sitemap()
+
+Or for every request, with the middleware:
+    MIDDLEWARE_CLASSES += ('apn_search.middleware.SearchDeduplicationMiddleware',)
+
+The number of duplicate searches absorbed is logged at the end, to help
+find the code that is repeating them.
+
+Each search gets its own copy of the response data, so that processing it
+can't affect the others. Writes made through the backend forget the
+remembered responses, so that searches made after them see the changes.
+
+"""
+
+import copy
+import logging
+import threading
+
+from contextlib import contextmanager
+
+from apn_search.backends.search_cache import normalize_search
+
+
+class SearchDeduplication(threading.local):
+
+    def __init__(self):
+        self.responses = None
+        self.duplicates = 0
+        self.label = None
+        self.log = logging.getLogger('haystack')
+
+    @contextmanager
+    def __call__(self, label=None):
+        # Nested usage shares the outermost memo.
+        if self.active:
+            yield
+            return
+
+        self.begin(label)
+        try:
+            yield
+        finally:
+            self.end()
+
+    @property
+    def active(self):
+        return self.responses is not None
+
+    def begin(self, label=None):
+        self.responses = {}
+        self.duplicates = 0
+        self.label = label
+
+    def end(self):
+        if self.duplicates:
+            self.log.info(
+                'Absorbed %d duplicate searches (%d distinct) in %s',
+                self.duplicates,
+                len(self.responses),
+                self.label or 'the current task',
+            )
+        self.responses = None
+        self.duplicates = 0
+        self.label = None
+
+    def make_key(self, connection_alias, index_names, search_kwargs, query_params):
+        """Return the memo key for a search, or None when not active."""
+        if self.active:
+            return (connection_alias, normalize_search(index_names, search_kwargs, query_params))
+
+    def get(self, key, query_string=None):
+        """
+        Return a copy of the remembered response for a search, or None. This
+        may be an AsyncResult when the first search was started with
+        search_async.
+
+        """
+        response = self.responses.get(key)
+        if response is not None:
+            self.duplicates += 1
+            self.log.debug('Duplicate search absorbed: %s', query_string)
+            response = copy_response(response)
+        return response
+
+    def set(self, key, response):
+        # Keep a copy of response data, which the caller could change.
+        if isinstance(response, dict):
+            response = copy.deepcopy(response)
+        self.responses[key] = response
+
+    def forget(self):
+        """Forget the remembered responses, e.g. after changing an index."""
+        if self.active:
+            self.responses.clear()
+
+
+class CopiedAsyncResult(object):
+    """An AsyncResult which returns a copy of its response data."""
+
+    def __init__(self, result):
+        self.result = result
+
+    def __getattr__(self, name):
+        return getattr(self.result, name)
+
+    def get(self, timeout=None):
+        return copy.deepcopy(self.result.get(timeout))
+
+
+def copy_response(response):
+    """Copy response data, or wrap an AsyncResult so that it copies it."""
+    if isinstance(response, dict):
+        return copy.deepcopy(response)
+    return CopiedAsyncResult(response)
+
+
+search_deduplication = SearchDeduplication()
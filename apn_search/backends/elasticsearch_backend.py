@@ -7,12 +7,17 @@ converting them into the format used by ForeignKeyField and ManyToManyField.
 
 """
 
+import functools
 import haystack
+import inspect
 import logging
 import requests
+import time
 
-from haystack.backends import elasticsearch_backend, log_query
-from haystack.constants import ID, DJANGO_CT
+from contextlib import contextmanager
+
+from haystack.backends import SQ, elasticsearch_backend, log_query
+from haystack.constants import ID, DJANGO_CT, DJANGO_ID
 from haystack.exceptions import MissingDependency, HaystackError
 from haystack.models import SearchResult
 from haystack.utils import get_identifier
@@ -29,25 +34,79 @@ except ImportError:
     get_proxied_model = None
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Model, Manager
 from django.db.models.query import QuerySet
 
+from apn_search.backends.bulk import BulkError, BulkResult
+from apn_search.backends.dedup import copy_response, search_deduplication
+from apn_search.backends.filters import FilterCompiler, combine_filters
+from apn_search.backends.refresh import get_bulk_loading_indexes, get_refresh_scheduler
+from apn_search.backends.search_cache import bump_generations, get_search_cache_key
+from apn_search.backends.transport import get_compression_stats, get_pool_stats, get_session
 from apn_search.inputs import ModelInput, Optional
-from apn_search.utils.dictionaries import merge_dictionaries
-from apn_search.utils.indexes import get_index
+from apn_search.results import ResultLayout, compact_result_class
+from apn_search.utils.dictionaries import flatten_dictionary, merge_dictionaries
+from apn_search.utils.geo import Distance
+from apn_search.utils.indexes import get_index, get_model_table
+from apn_search.utils.json_codecs import get_codec
 from apn_search.utils.mappings import find_conflicts
+from apn_search.utils.threads import get_thread_pool, merge_iterators
+
+
+# The cache key recording the new index which an alias is being reindexed
+# into. It is kept in the cache so that every process sees it.
+REINDEX_CACHE_KEY = 'apn_search.reindex:%s'
+
+# The (time checked, new index name) of each alias, as last read from the
+# cache by this process, so that writes don't all have to check the cache.
+_reindex_states = {}
 
 
 class ElasticSearch(pyelasticsearch.ElasticSearch):
 
+    def __init__(self, urls, session=None, json_codec=None, **kwargs):
+        super(ElasticSearch, self).__init__(urls, **kwargs)
+        if session is not None:
+            self.session = session
+        self.json_codec = get_codec(json_codec)
+
+    def _encode_json(self, value):
+        return self.json_codec.dumps(value, default=self._json_default)
+
+    def _json_default(self, value):
+        """Encode values that are not supported by JSON."""
+        converted = self.from_python(value)
+        if converted is value:
+            raise TypeError('%r is not JSON serializable' % value)
+        return converted
+
+    def _decode_response(self, response):
+        try:
+            return self.json_codec.loads(response.content)
+        except ValueError:
+            # The same error as pyelasticsearch raises itself.
+            raise pyelasticsearch.InvalidJsonResponseError(response)
+
+    def get_pool_stats(self):
+        """Return statistics about the HTTP connection pools, by host."""
+        return get_pool_stats(self.session)
+
+    def get_compression_stats(self):
+        """Return the bytes saved and time spent by gzip compression."""
+        return get_compression_stats(self.session)
+
     def _send_request(self, *args, **kwargs):
 
+        # Bulk responses are checked by the caller when this is False.
+        check_items = kwargs.pop('check_items', True)
+
         response_data = super(ElasticSearch, self)._send_request(*args, **kwargs)
 
         # It is possible to get a 200 response containing error information.
         # Check for these errors, and raise an exception if any are found.
         items = response_data.get('items')
-        if isinstance(items, list):
+        if check_items and isinstance(items, list):
             errors = []
             for item in items:
                 index = item.get('index')
@@ -61,6 +120,64 @@ class ElasticSearch(pyelasticsearch.ElasticSearch):
 
         return response_data
 
+    def scroll(self, scroll_id, keep_alive):
+        """Fetch the next batch of hits for a scroll cursor."""
+        return self._send_request(
+            'GET',
+            ['_search', 'scroll'],
+            scroll_id,
+            query_params={'scroll': keep_alive},
+            encode_body=False,
+        )
+
+    def clear_scroll(self, scroll_id):
+        """Release the search context of a scroll cursor."""
+        return self._send_request(
+            'DELETE',
+            ['_search', 'scroll'],
+            scroll_id,
+            encode_body=False,
+        )
+
+    def encode_bulk_index(self, index, doc_type, doc, id_field='id', op_type='index'):
+        """
+        Encode a document as the lines of a bulk index action. Use the
+        'create' op_type to leave existing documents alone.
+
+        """
+        action = {
+            op_type: {
+                '_index': index,
+                '_type': doc_type,
+            }
+        }
+        if doc.get(id_field) is not None:
+            action[op_type]['_id'] = doc[id_field]
+        # The document has been converted with from_python, but it can
+        # still contain nested values (e.g. dates in dictionaries) which
+        # need the default function.
+        return '%s\n%s\n' % (self.json_codec.dumps(action), self.json_codec.dumps(doc, default=self._json_default))
+
+    def encode_bulk_delete(self, index, doc_type, id):
+        """Encode the line of a bulk delete action."""
+        action = {
+            'delete': {
+                '_index': index,
+                '_type': doc_type,
+                '_id': id,
+            }
+        }
+        return '%s\n' % self.json_codec.dumps(action)
+
+    def send_bulk(self, actions):
+        """
+        Send encoded bulk actions in a single request. Returns a BulkResult
+        rather than raising an exception when some of the items failed.
+
+        """
+        response_data = self._send_request('POST', ['_bulk'], ''.join(actions), encode_body=False, check_items=False)
+        return BulkResult(response_data)
+
     def from_python(self, value):
         """
         Converts Python values to a form suitable for ElasticSearch's JSON.
@@ -77,14 +194,71 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
 
     def __init__(self, connection_alias, **connection_options):
         super(ElasticsearchSearchBackend, self).__init__(connection_alias, **connection_options)
-        self.conn = ElasticSearch(connection_options['URL'], timeout=self.timeout)
+        self.conn = ElasticSearch(
+            connection_options['URL'],
+            timeout=self.timeout,
+            session=get_session(
+                connection_alias,
+                GZIP_THRESHOLD=connection_options.get('GZIP_THRESHOLD'),
+                **connection_options.get('CONNECTION_POOL', {})
+            ),
+            json_codec=connection_options.get('JSON_CODEC'),
+        )
         self.new_version = bool(connection_options.get('NEW_VERSION'))
+        self.bulk_max_docs = int(connection_options.get('BULK_MAX_DOCS', 500))
+        self.bulk_max_bytes = int(connection_options.get('BULK_MAX_BYTES', 10 * 1024 * 1024))
+        self.bulk_retries = int(connection_options.get('BULK_RETRIES', 3))
+        self.bulk_retry_delay = float(connection_options.get('BULK_RETRY_DELAY', 0.5))
+        self.search_threads = int(connection_options.get('SEARCH_THREADS', 4))
+        self.use_aliases = bool(connection_options.get('USE_ALIASES'))
+        self.compile_filters = bool(connection_options.get('COMPILE_FILTERS'))
+        self.search_cache = bool(connection_options.get('SEARCH_CACHE'))
+        self.reindex_timeout = int(connection_options.get('REINDEX_TIMEOUT', 24 * 60 * 60))
+        self.reindex_check_interval = float(connection_options.get('REINDEX_CHECK_INTERVAL', 5.0))
+        self.bulk_loading = get_bulk_loading_indexes(connection_alias)
+        self.refresh_scheduler = get_refresh_scheduler(
+            connection_alias,
+            self.conn,
+            mode=connection_options.get('REFRESH_MODE', 'sync'),
+            interval=float(connection_options.get('REFRESH_INTERVAL', 1.0)),
+            search_cache=self.search_cache,
+        )
+
+    @property
+    def search_pool(self):
+        """The thread pool for running searches concurrently."""
+        return get_thread_pool(self.connection_alias, self.search_threads)
 
     def build_search_kwargs(self, *args, **kwargs):
         direct = kwargs.pop('direct', None)
+        only_fields = kwargs.pop('only_fields', None)
+        kwargs.pop('cache_timeout', None)
+        kwargs.pop('compact', None)
+        compiled_filter = kwargs.pop('compiled_filter', None)
         search_kwargs = super(ElasticsearchSearchBackend, self).build_search_kwargs(*args, **kwargs)
+        if compiled_filter:
+            search_kwargs['query'] = {
+                'filtered': {
+                    'query': search_kwargs['query'],
+                    'filter': compiled_filter,
+                },
+            }
+        if only_fields:
+            search_kwargs['_source'] = self.build_source_fields(only_fields)
         return merge_dictionaries(search_kwargs, direct)
 
+    def build_source_fields(self, field_names):
+        """
+        Build the list of stored fields to fetch for the specified field
+        names, including the fields required to build search results.
+
+        """
+        unified_index = haystack.connections[self.connection_alias].get_unified_index()
+        source_fields = set((ID, DJANGO_CT, DJANGO_ID))
+        for field_name in field_names:
+            source_fields.add(unified_index.get_index_fieldname(field_name))
+        return sorted(source_fields)
+
     def build_schema(self, fields):
 
         content_field_name, field_mapping = super(ElasticsearchSearchBackend, self).build_schema(fields)
@@ -125,53 +299,170 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
         self.setup_index_groups()
 
         # Set up each index group individually.
-        for index_name, indexes in self.index_groups.items():
-
-            # Make a temporary "unified index" but only for this 1 index.
-            isolated_index = ElasticsearchSearchEngine.unified_index()
-            isolated_index.build(indexes=indexes)
-
-            # Build the mappings for this index.
-            self.content_field_name, field_mapping = self.build_schema(isolated_index.all_searchfields())
-            current_mapping = {
-                'modelresult': {
-                    'properties': field_mapping
-                }
+        for group_name, indexes in self.index_groups.items():
+            index_name = self.physical_index_names[group_name]
+            self.setup_index(index_name, indexes)
+            if index_name != group_name:
+                self.setup_alias(group_name, index_name)
+
+        self.setup_complete = True
+
+    def setup_index(self, index_name, indexes):
+        """Create an index and set up its mappings for the given indexes."""
+
+        # Make a temporary "unified index" but only for this 1 index.
+        isolated_index = ElasticsearchSearchEngine.unified_index()
+        isolated_index.build(indexes=indexes)
+
+        # Build the mappings for this index.
+        self.content_field_name, field_mapping = self.build_schema(isolated_index.all_searchfields())
+        current_mapping = {
+            'modelresult': {
+                'properties': field_mapping
             }
+        }
 
-            try:
+        try:
 
-                # Try to push those mappings into ElasticSearch.
-                # Make sure the index is there first.
-                self.conn.create_index(index_name, self.DEFAULT_SETTINGS)
-                self.conn.put_mapping('modelresult', current_mapping, indexes=[index_name])
-                self.existing_mapping = current_mapping
+            # Try to push those mappings into ElasticSearch.
+            # Make sure the index is there first.
+            self.conn.create_index(index_name, self.DEFAULT_SETTINGS)
+            self.conn.put_mapping('modelresult', current_mapping, indexes=[index_name])
+            self.existing_mapping = current_mapping
 
-            except Exception as error:
+        except Exception as error:
 
-                # Something went wrong.
-                # Find out what the current mappings are in ElasticSearch.
+            # Something went wrong.
+            # Find out what the current mappings are in ElasticSearch.
+            try:
+                self.existing_mapping = self.conn.get_mapping()[index_name]
+            except KeyError:
+                pass
+            except Exception:
+                if not self.silently_fail:
+                    raise error
+
+            if settings.DEBUG or settings.TEST_MODE or not self.silently_fail:
+                # Check for obvious conflicts, otherwise just raise the error.
                 try:
-                    self.existing_mapping = self.conn.get_mapping()[index_name]
-                except KeyError:
-                    pass
-                except Exception:
-                    if not self.silently_fail:
+                    for field_name in find_conflicts(self.existing_mapping, current_mapping):
+                        raise HaystackError("There is a mapping conflict for the %r field. Use the 'check_index' command." % field_name)
+                    else:
                         raise error
+                except Exception:
+                    raise error
+            else:
+                logging.exception(log_function=logging.error)
 
-                if settings.DEBUG or settings.TEST_MODE or not self.silently_fail:
-                    # Check for obvious conflicts, otherwise just raise the error.
-                    try:
-                        for field_name in find_conflicts(self.existing_mapping, current_mapping):
-                            raise HaystackError("There is a mapping conflict for the %r field. Use the 'check_index' command." % field_name)
-                        else:
-                            raise error
-                    except Exception:
-                        raise error
-                else:
-                    logging.exception(log_function=logging.error)
+    def setup_alias(self, alias_name, index_name):
+        """
+        Point an alias at an index, if the alias does not exist yet. Existing
+        aliases are left alone; the reindex command moves them when the new
+        index is ready.
 
-        self.setup_complete = True
+        """
+        try:
+            if not self.get_alias_indexes(alias_name):
+                self.swap_alias(alias_name, index_name)
+        except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
+            if not self.silently_fail:
+                raise
+
+            self.log.error("Failed to set up Elasticsearch alias '%s': %s", alias_name, e)
+
+    def index_exists(self, index_name):
+        """Check if an index (or alias) exists."""
+        try:
+            self.conn._send_request('GET', [index_name, '_settings'])
+        except pyelasticsearch.ElasticHttpNotFoundError:
+            return False
+        else:
+            return True
+
+    def get_alias_indexes(self, alias_name):
+        """Return the names of the indexes which an alias points to."""
+        try:
+            response = self.conn._send_request('GET', ['_alias', alias_name])
+        except pyelasticsearch.ElasticHttpNotFoundError:
+            return []
+        return sorted(response.keys())
+
+    def swap_alias(self, alias_name, index_name):
+        """
+        Point an alias at an index, removing it from any other indexes,
+        in a single atomic operation.
+
+        """
+        actions = []
+        for old_index_name in self.get_alias_indexes(alias_name):
+            if old_index_name != index_name:
+                actions.append({'remove': {'index': old_index_name, 'alias': alias_name}})
+        actions.append({'add': {'index': index_name, 'alias': alias_name}})
+        self.conn._send_request('POST', ['_aliases'], {'actions': actions})
+        self.invalidate_searches([alias_name])
+        search_deduplication.forget()
+
+    def refresh_indexes(self, index_names):
+        """Refresh indexes now, and then invalidate their cached searches."""
+        self.conn.refresh(indexes=index_names)
+        self.invalidate_searches(index_names)
+
+    def invalidate_searches(self, index_names):
+        """Invalidate the cached searches of indexes, if the cache is enabled."""
+        if self.search_cache:
+            bump_generations(index_names)
+
+    def schedule_refresh(self, index_names):
+        """Schedule refreshes of indexes, except those being bulk loaded."""
+        for index_name in index_names:
+            if index_name not in self.bulk_loading:
+                self.refresh_scheduler.schedule(index_name)
+
+    def start_reindex(self, alias_name, index_name):
+        """
+        Send the updates and deletes of an alias to a new index as well as
+        the current one, while the reindex command is loading the new index.
+        This is recorded in the cache, so that it reaches other processes
+        like the update consumer; they must share the same cache backend.
+        Processes check it every REINDEX_CHECK_INTERVAL seconds, so wait
+        that long before loading the new index.
+
+        """
+        cache.set(REINDEX_CACHE_KEY % alias_name, index_name, self.reindex_timeout)
+
+    def finish_reindex(self, alias_name):
+        """Stop sending the updates of an alias to its new index."""
+        cache.delete(REINDEX_CACHE_KEY % alias_name)
+
+    def get_write_index_names(self, index_name):
+        """
+        Return the names of the indexes that writes to an index group should
+        be sent to. This includes the new index while it is being reindexed.
+
+        """
+        if self.use_aliases:
+            key = (self.connection_alias, index_name)
+            now = time.time()
+            checked, new_index_name = _reindex_states.get(key, (None, None))
+            if checked is None or now - checked >= self.reindex_check_interval:
+                new_index_name = cache.get(REINDEX_CACHE_KEY % index_name)
+                _reindex_states[key] = (now, new_index_name)
+            if new_index_name and new_index_name != index_name:
+                return [index_name, new_index_name]
+        return [index_name]
+
+    def count_model_documents(self, index_name, model):
+        """Count the documents of a model in an index."""
+        content_type = '%s.%s' % (model._meta.app_label, model._meta.module_name)
+        query = {
+            'query': {
+                'term': {
+                    DJANGO_CT: content_type,
+                },
+            },
+        }
+        response = self.conn._send_request('GET', [index_name, 'modelresult', '_count'], query)
+        return response['count']
 
     def setup_index_groups(self):
 
@@ -181,12 +472,23 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
         unified_index = haystack.connections[self.connection_alias].get_unified_index()
         unified_index.setup_indexes()
 
+        # When using aliases, everything reads and writes through the alias
+        # name of each group, and the physical (versioned) index behind it
+        # can be replaced by the reindex command.
         index_groups = {}
         index_names = {}
         model_index_names = {}
+        physical_index_names = {}
         for index in unified_index.indexes.values():
 
-            index_name = index.get_index_name(using=self.connection_alias)
+            physical_index_name = index.get_index_name(using=self.connection_alias)
+            if self.use_aliases:
+                index_name = index.get_alias_name(using=self.connection_alias)
+            else:
+                index_name = physical_index_name
+
+            if physical_index_names.setdefault(index_name, physical_index_name) != physical_index_name:
+                raise HaystackError('The %r index group contains different index versions.' % index_name)
 
             index_groups.setdefault(index_name, []).append(index)
             index_names[index] = index_name
@@ -195,8 +497,231 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
         self.index_groups = index_groups
         self.index_names = index_names
         self.model_index_names = model_index_names
+        self.physical_index_names = physical_index_names
+
+        # Build the table used to create results for each hit.
+        get_model_table(self.connection_alias)
+
+    def get_index_names(self, models=None):
+        """
+        Find the indexes for the specified models,
+        or default to all indexes if no models were supplied.
+
+        """
 
-    def update(self, index, iterable, commit=True):
+        if models:
+            index_names = set()
+            for model in models:
+                try:
+                    index_names.add(self.model_index_names[model])
+                except KeyError:
+                    logging.warning('No haystack index name found for %r. Mappings are %r' % (model, self.model_index_names), also_print=settings.DEBUG)
+            if not index_names:
+                raise HaystackError('No haystack indexes found for %s' % models)
+            return list(index_names)
+        else:
+            return self.index_groups.keys()
+
+    def scan(self, search_kwargs, index_names, batch_size=500, keep_alive='5m', **query_params):
+        """
+        Stream every hit of a search using a scan/scroll cursor.
+
+        Unlike paging with from/size, each batch costs the same no matter how
+        deep into the results it is. The batch size applies per shard, which
+        is how scan searches work in ElasticSearch.
+
+        The scroll context is cleared when the generator is exhausted, closed
+        or garbage collected, rather than waiting for the keep-alive to expire.
+
+        """
+
+        response = self.conn.search(
+            None,
+            search_kwargs,
+            indexes=index_names,
+            doc_types=['modelresult'],
+            search_type='scan',
+            scroll=keep_alive,
+            size=batch_size,
+            **query_params
+        )
+        scroll_id = response.get('_scroll_id')
+
+        try:
+            while scroll_id:
+                response = self.conn.scroll(scroll_id, keep_alive)
+                scroll_id = response.get('_scroll_id')
+                hits = response.get('hits', {}).get('hits', [])
+                if not hits:
+                    break
+                for hit in hits:
+                    yield hit
+        finally:
+            if scroll_id:
+                try:
+                    self.conn.clear_scroll(scroll_id)
+                except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
+                    self.log.warning("Failed to clear Elasticsearch scroll: %s", e)
+
+    def parallel_scan(self, search_kwargs, index_names, batch_size=500, keep_alive='5m', slices=1, workers=4, buffer_size=10000):
+        """
+        Stream every hit of a search by scrolling through each index in
+        parallel worker threads. The hits are merged into one iterator,
+        in no particular order.
+
+        Each index can also be split into a number of slices, which are
+        scrolled separately. Slices are made by dividing up the shards of the
+        index, so there cannot be more slices than shards.
+
+        """
+
+        factories = []
+        for index_name in index_names:
+            for preference in self.get_shard_preferences(index_name, slices):
+                query_params = {}
+                if preference:
+                    query_params['preference'] = preference
+                factories.append(functools.partial(
+                    self.scan,
+                    search_kwargs,
+                    [index_name],
+                    batch_size=batch_size,
+                    keep_alive=keep_alive,
+                    **query_params
+                ))
+
+        return merge_iterators(factories, workers=workers, buffer_size=buffer_size)
+
+    def get_shard_preferences(self, index_name, slices):
+        """
+        Return search preference values that split an index into slices
+        by shard. Returns [None] when the index does not need splitting.
+
+        """
+
+        if slices <= 1:
+            return [None]
+
+        shards = int(self.get_index_settings(index_name)['index.number_of_shards'])
+
+        preferences = []
+        for number in range(min(slices, shards)):
+            shard_numbers = range(number, shards, slices)
+            preferences.append('_shards:%s' % ','.join(str(shard) for shard in shard_numbers))
+        return preferences
+
+    def get_index_settings(self, index_name):
+        """
+        Return the settings of an index, flattened into a dictionary
+        with dotted keys (e.g. 'index.refresh_interval').
+
+        """
+
+        # The response is keyed by the physical index name,
+        # which is different when index_name is an alias.
+        response = self.conn._send_request('GET', [index_name, '_settings'])
+        return flatten_dictionary(response.values()[0]['settings'])
+
+    def update_index_settings(self, index_name, index_settings):
+        """Change the dynamic settings of an index."""
+        self.conn._send_request('PUT', [index_name, '_settings'], index_settings)
+
+    @contextmanager
+    def bulk_load_mode(self, index_names, merge_throttle=None, optimize=True):
+        """
+        Tune indexes for loading large numbers of documents. Refreshing is
+        disabled and replicas are removed, and the merge throttling limit of
+        the cluster can be raised (e.g. merge_throttle='200mb'). Updates made
+        through this backend don't schedule refreshes of the indexes either.
+
+        The original settings are restored afterwards, even after errors,
+        and the indexes are refreshed once. When loading was successful, the
+        indexes are also optimized.
+
+        """
+
+        original_settings = {}
+        for index_name in index_names:
+            index_settings = self.get_index_settings(index_name)
+            original_settings[index_name] = {
+                'index.refresh_interval': index_settings.get('index.refresh_interval', '1s'),
+                'index.number_of_replicas': index_settings.get('index.number_of_replicas', 1),
+            }
+
+        original_throttle = None
+        if merge_throttle:
+            cluster_settings = flatten_dictionary(self.conn._send_request('GET', ['_cluster', 'settings']))
+            original_throttle = (
+                cluster_settings.get('transient.indices.store.throttle.max_bytes_per_sec') or
+                cluster_settings.get('persistent.indices.store.throttle.max_bytes_per_sec') or
+                '20mb'
+            )
+
+        loaded = False
+
+        try:
+
+            self.bulk_loading.update(index_names)
+
+            for index_name in index_names:
+                self.update_index_settings(index_name, {
+                    'index.refresh_interval': '-1',
+                    'index.number_of_replicas': 0,
+                })
+
+            if merge_throttle:
+                self.set_merge_throttle(merge_throttle)
+
+            yield
+
+            loaded = True
+
+        finally:
+
+            self.bulk_loading.difference_update(index_names)
+
+            try:
+
+                for index_name in index_names:
+                    self.update_index_settings(index_name, original_settings[index_name])
+
+                if merge_throttle:
+                    self.set_merge_throttle(original_throttle)
+
+                self.refresh_indexes(index_names)
+
+            except Exception:
+                if loaded:
+                    raise
+                # Don't hide the error that stopped the loading.
+                self.log.exception("Failed to restore the settings of '%s' after bulk loading", ', '.join(index_names))
+
+        if optimize:
+            self.conn.optimize(indexes=index_names)
+
+    def set_merge_throttle(self, max_bytes_per_sec):
+        """Change the merge throttling limit of the cluster."""
+        self.conn._send_request('PUT', ['_cluster', 'settings'], {
+            'transient': {
+                'indices.store.throttle.max_bytes_per_sec': max_bytes_per_sec,
+            },
+        })
+
+    def update(self, index, iterable, commit=True, index_name=None, op_type='index'):
+        """
+        Add or update documents in the index. Provide an index_name to write
+        to a specific physical index instead of the index group's usual name.
+        Use the 'create' op_type to only add documents which are not in the
+        index yet.
+
+        With commit=False, the changes are visible after the next refresh.
+        Use refresh_indexes() to refresh and invalidate cached searches.
+
+        Returns the BulkItems of the actions that failed. The ones that were
+        still rejected after retrying are also raised as a BulkError, unless
+        the backend is silently failing.
+
+        """
 
         if not self.setup_complete:
             try:
@@ -206,9 +731,20 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
                     raise
 
                 self.log.error("Failed to add documents to Elasticsearch: %s", e)
-                return
+                return []
+
+        if index_name is None:
+            index_name = self.index_names[index]
+            index_names = self.get_write_index_names(index_name)
+        else:
+            index_names = [index_name]
 
-        prepped_docs = []
+        # Stream the objects into bulk requests, sending each chunk when it
+        # reaches the document count or payload size limit, so that memory
+        # use is bounded by the size of one chunk.
+        chunk = []
+        chunk_size = 0
+        failed = []
 
         for obj in iterable:
             try:
@@ -219,7 +755,10 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
                 for key, value in prepped_data.items():
                     final_data[key] = self.conn.from_python(value)
 
-                prepped_docs.append(final_data)
+                actions = [
+                    self.conn.encode_bulk_index(name, 'modelresult', final_data, id_field=ID, op_type=op_type)
+                    for name in index_names
+                ]
             except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
                 if not self.silently_fail:
                     raise
@@ -233,13 +772,96 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
                         "object": get_identifier(obj)
                     }
                 })
+                continue
 
-        index_name = self.index_names[index]
+            actions_size = sum(len(action) for action in actions)
+            if chunk and (len(chunk) >= self.bulk_max_docs or chunk_size + actions_size > self.bulk_max_bytes):
+                failed.extend(self.send_bulk(index_name, chunk))
+                chunk = []
+                chunk_size = 0
 
-        self.conn.bulk_index(index_name, 'modelresult', prepped_docs, id_field=ID)
+            chunk.extend(actions)
+            chunk_size += actions_size
+
+        if chunk:
+            failed.extend(self.send_bulk(index_name, chunk))
 
         if commit:
-            self.conn.refresh(indexes=[index_name])
+            self.schedule_refresh(index_names)
+
+        search_deduplication.forget()
+
+        self.raise_bulk_failures(index_name, [item for item in failed if item.retryable])
+
+        return failed
+
+    def send_bulk(self, index_name, actions):
+        """
+        Send a chunk of encoded bulk actions.
+
+        Items that were rejected for temporary reasons (e.g. a full thread
+        pool or a timeout) are sent again, with increasing delays between
+        attempts. Items that failed permanently (e.g. mapping errors) are
+        logged with their document ids, without affecting the other items.
+
+        Returns the items that failed permanently, and the rejected items
+        that were still failing after retrying.
+
+        """
+
+        attempt = 0
+        failed = []
+
+        while True:
+
+            started = time.time()
+            result = self.conn.send_bulk(actions)
+            duration = time.time() - started
+
+            self.log.debug(
+                "Sent %d bulk actions (%d bytes) to '%s' in %.3fs",
+                len(actions),
+                sum(len(action) for action in actions),
+                index_name,
+                duration,
+            )
+
+            for item in result.permanent:
+                self.log.error("Failed to %s document '%s' in '%s': %s", item.action, item.doc_id, index_name, item.error)
+                failed.append(item)
+
+            rejected = result.retryable
+            if not rejected:
+                return failed
+
+            if attempt >= self.bulk_retries:
+                self.log.error("Giving up on %d rejected bulk actions for '%s' after %d attempts", len(rejected), index_name, attempt + 1)
+                return failed + rejected
+
+            delay = self.bulk_retry_delay * (2 ** attempt)
+            attempt += 1
+
+            self.log.warning("Retrying %d rejected bulk actions for '%s' in %.1fs", len(rejected), index_name, delay)
+            time.sleep(delay)
+
+            actions = [actions[item.position] for item in rejected]
+
+    def raise_bulk_failures(self, index_name, failed):
+        """Handle bulk items that could not be processed after retrying."""
+
+        if not failed:
+            return
+
+        message = "%d bulk actions for '%s' were rejected: %s" % (
+            len(failed),
+            index_name,
+            ', '.join(str(item.doc_id) for item in failed),
+        )
+
+        if not self.silently_fail:
+            raise BulkError(message, failed)
+
+        self.log.error(message)
 
     def remove(self, obj_or_string, commit=True):
         doc_id = get_identifier(obj_or_string)
@@ -258,16 +880,84 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
         index_name = self.index_names[index]
 
         try:
+            index_names = self.get_write_index_names(index_name)
             self.conn.delete(index_name, 'modelresult', doc_id)
 
+            # The new index of a reindex might not have the document yet.
+            for new_index_name in index_names[1:]:
+                try:
+                    self.conn.delete(new_index_name, 'modelresult', doc_id)
+                except pyelasticsearch.ElasticHttpNotFoundError:
+                    pass
+
             if commit:
-                self.conn.refresh(indexes=[index_name])
+                self.schedule_refresh(index_names)
+
+            search_deduplication.forget()
         except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
             if not self.silently_fail:
                 raise
 
             self.log.error("Failed to remove document '%s' from Elasticsearch: %s", doc_id, e)
 
+    def remove_many(self, identifiers, commit=True):
+        """
+        Remove many documents from the index. The deletes are grouped by
+        index and sent as chunked bulk requests, with one refresh per index.
+
+        """
+
+        if not self.setup_complete:
+            try:
+                self.setup()
+            except pyelasticsearch.ElasticSearchError, e:
+                if not self.silently_fail:
+                    raise
+
+                self.log.error("Failed to remove documents from Elasticsearch: %s", e)
+                return
+
+        index_doc_ids = {}
+        for obj_or_string in identifiers:
+            doc_id = get_identifier(obj_or_string)
+            index_name = self.index_names[get_index(doc_id)]
+            index_doc_ids.setdefault(index_name, []).append(doc_id)
+
+        # Send the deletes to every index before raising any failures.
+        failed = []
+        failed_index_names = []
+
+        for index_name, doc_ids in index_doc_ids.items():
+
+            failed_count = len(failed)
+
+            try:
+
+                write_index_names = self.get_write_index_names(index_name)
+
+                for start in range(0, len(doc_ids), self.bulk_max_docs):
+                    actions = []
+                    for doc_id in doc_ids[start:start + self.bulk_max_docs]:
+                        for name in write_index_names:
+                            actions.append(self.conn.encode_bulk_delete(name, 'modelresult', doc_id))
+                    failed.extend(item for item in self.send_bulk(index_name, actions) if item.retryable)
+
+                if commit:
+                    self.schedule_refresh(write_index_names)
+
+                search_deduplication.forget()
+
+            except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
+                if not self.silently_fail:
+                    raise
+
+                self.log.error("Failed to remove %d documents from '%s': %s", len(doc_ids), index_name, e)
+
+            if len(failed) > failed_count:
+                failed_index_names.append(index_name)
+
+        self.raise_bulk_failures(', '.join(failed_index_names), failed)
+
     def clear(self, models=[], commit=True):
 
         if not self.setup_complete:
@@ -292,7 +982,9 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
                     self.conn.delete_by_query(index_name, 'modelresult', {'query_string': {'query': " OR ".join(models_to_delete)}})
 
                 if commit:
-                    self.conn.refresh(indexes=[index_name])
+                    self.refresh_indexes([index_name])
+
+                search_deduplication.forget()
 
             except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
                 if not self.silently_fail:
@@ -303,13 +995,12 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
                 else:
                     self.log.error("Failed to clear Elasticsearch index: %s", e)
 
-    @log_query
-    def search(self, query_string, **kwargs):
-        if len(query_string) == 0:
-            return {
-                'results': [],
-                'hits': 0,
-            }
+    def build_search_request(self, query_string, **kwargs):
+        """
+        Build the parts of a search request:
+        the index names, the request body and the query parameters.
+
+        """
 
         if not self.setup_complete:
             self.setup()
@@ -324,32 +1015,326 @@ class ElasticsearchSearchBackend(elasticsearch_backend.ElasticsearchSearchBacken
         if kwargs.get('end_offset') is not None and kwargs.get('end_offset') > kwargs.get('start_offset', 0):
             query_params['size'] = kwargs.get('end_offset') - kwargs.get('start_offset', 0)
 
-        # Find the indexes for the specified models,
-        # or default to all indexes if no models were supplied.
-        models = kwargs.get('models')
-        if models:
-            index_names = set()
-            for model in models:
-                try:
-                    index_names.add(self.model_index_names[model])
-                except KeyError:
-                    logging.warning('No haystack index name found for %r. Mappings are %r' % (model, self.model_index_names), also_print=settings.DEBUG)
-            if not index_names:
-                raise HaystackError('No haystack indexes found for %s' % models)
+        index_names = self.get_index_names(kwargs.get('models'))
 
-        else:
-            index_names = self.index_groups.keys()
+        return index_names, search_kwargs, query_params
+
+    def search_raw(self, query_string, **kwargs):
+        """Perform a search and return the unprocessed response data."""
+        index_names, search_kwargs, query_params = self.build_search_request(query_string, **kwargs)
+        return self.send_search(query_string, index_names, search_kwargs, query_params, cache_timeout=kwargs.get('cache_timeout'))
+
+    def search_async(self, query_string, **kwargs):
+        """
+        Start a search in the backend's thread pool. Returns an AsyncResult,
+        which provides the unprocessed response data from its get() method.
+
+        Only the request itself runs in the thread; the results should be
+        processed by the calling thread.
+
+        """
+        index_names, search_kwargs, query_params = self.build_search_request(query_string, **kwargs)
+
+        # Deduplication is thread local, so it must be checked here
+        # rather than in the thread which sends the request.
+        dedup_key = search_deduplication.make_key(self.connection_alias, index_names, search_kwargs, query_params)
+        if dedup_key:
+            response = search_deduplication.get(dedup_key, query_string)
+            if response is not None:
+                return response
+
+        response = self.search_pool.apply_async(
+            self.send_search,
+            (query_string, index_names, search_kwargs, query_params),
+            {'cache_timeout': kwargs.get('cache_timeout')},
+        )
+
+        if dedup_key:
+            search_deduplication.set(dedup_key, response)
+            # Don't share the response data with the duplicates.
+            response = copy_response(response)
+
+        return response
+
+    def send_search(self, query_string, index_names, search_kwargs, query_params, cache_timeout=None):
+        """
+        Send a search request and return the unprocessed response data.
+
+        Provide a cache_timeout to use the search cache, when the SEARCH_CACHE
+        option is enabled. Cached responses are invalidated whenever the
+        searched indexes are refreshed.
+
+        Identical searches are only sent once while search_deduplication
+        is active.
+
+        """
+
+        dedup_key = search_deduplication.make_key(self.connection_alias, index_names, search_kwargs, query_params)
+        if dedup_key:
+            raw_results = search_deduplication.get(dedup_key, query_string)
+            if raw_results is not None:
+                if not isinstance(raw_results, dict):
+                    # An AsyncResult from search_async.
+                    raw_results = raw_results.get()
+                return raw_results
+
+        raw_results = None
+
+        # Cached responses are only invalidated with the SEARCH_CACHE option.
+        if not self.search_cache:
+            cache_timeout = None
+
+        if cache_timeout:
+            cache_key = get_search_cache_key(index_names, search_kwargs, query_params)
+            raw_results = cache.get(cache_key)
+
+        if raw_results is None:
+
+            try:
+                raw_results = self.conn.search(None, search_kwargs, indexes=index_names, doc_types=['modelresult'], **query_params)
+            except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
+                if not self.silently_fail:
+                    raise
+
+                self.log.error("Failed to query Elasticsearch using '%s': %s", query_string, e)
+                return {}
+
+            if cache_timeout:
+                cache.set(cache_key, raw_results, cache_timeout)
+
+        if dedup_key:
+            search_deduplication.set(dedup_key, raw_results)
+
+        return raw_results
+
+    def process_search_results(self, raw_results, **kwargs):
+        """Process the response data of a search with the search kwargs."""
+
+        # Distances are only in the response when sorting by distance.
+        distance_point = kwargs.get('distance_point')
+        geo_sort = bool(distance_point) and 'distance' in [field for field, direction in kwargs.get('sort_by') or ()]
+
+        if kwargs.get('compact'):
+            return self._process_compact_results(
+                raw_results,
+                result_class=kwargs.get('result_class'),
+                only_fields=kwargs.get('only_fields'),
+                distance_point=distance_point,
+                geo_sort=geo_sort,
+            )
+
+        results = self._process_results(
+            raw_results,
+            highlight=kwargs.get('highlight'),
+            result_class=kwargs.get('result_class', SearchResult),
+            distance_point=distance_point,
+            geo_sort=geo_sort,
+        )
+
+        # Let the results know which fields were fetched, so they can
+        # complain properly when trying to access the other fields.
+        only_fields = kwargs.get('only_fields')
+        if only_fields:
+            fetched_fields = frozenset(only_fields)
+            for result in results.get('results', []):
+                result._fetched_fields = fetched_fields
+
+        return results
+
+    def _process_compact_results(self, raw_results, result_class=None, only_fields=None, distance_point=None, geo_sort=False):
+        """
+        Like _process_results, but create compact results. The results of
+        each index share a field layout, and the fields are only converted
+        when they are first read.
+
+        """
+
+        # Let the normal method handle everything except for the hits.
+        hits_data = raw_results.get('hits', {})
+        results = self._process_results(dict(raw_results, hits=dict(hits_data, hits=[])))
+
+        # Use the result classes of the indexes unless a class was given.
+        # Functions that create results can't be used, except for the ones
+        # which do the same thing (e.g. SearchQuerySet.create_result).
+        if getattr(result_class, 'uses_index_result_class', False):
+            result_class = None
+        elif result_class is not None and not inspect.isclass(result_class):
+            raise HaystackError(
+                'Compact results can not be created by %r. '
+                'Use a result class instead.' % result_class
+            )
+
+        model_table = get_model_table(self.connection_alias)
+        content_field = haystack.connections[self.connection_alias].get_unified_index().document_field
+        fetched_fields = only_fields and frozenset(only_fields) or None
+
+        layouts = {}
+        compact_results = []
+
+        for raw_result in hits_data.get('hits', []):
+
+            source = raw_result['_source']
+            app_label, model_name = source[DJANGO_CT].split('.')
+
+            try:
+                indexed_model = model_table[(app_label, model_name)]
+            except KeyError:
+                results['hits'] -= 1
+                continue
+
+            names = tuple(str(name) for name in source if name not in (DJANGO_CT, DJANGO_ID))
+            values = [source[name] for name in names]
+            if 'highlight' in raw_result:
+                names += ('highlighted',)
+                values.append(raw_result['highlight'].get(content_field, ''))
+
+            layout_key = (indexed_model.index, names)
+            layout = layouts.get(layout_key)
+            if layout is None:
+                layout = layouts[layout_key] = self.build_result_layout(indexed_model.index, names, fetched_fields)
+
+            compact_class = compact_result_class(result_class or indexed_model.result_class)
+            result = compact_class(app_label, model_name, source[DJANGO_ID], raw_result['_score'], layout, values)
+
+            if distance_point:
+                result._point_of_origin = distance_point
+                if geo_sort and raw_result.get('sort'):
+                    result._distance = Distance(km=float(raw_result['sort'][0]))
+
+            compact_results.append(result)
+
+        results['results'] = compact_results
+
+        return results
+
+    def build_result_layout(self, index, names, fetched_fields=None):
+        """
+        Build a ResultLayout with the field converters of an index.
+        Highlights are used as they are.
+
+        """
+        converters = []
+        for name in names:
+            field = index.fields.get(name)
+            if name == 'highlighted':
+                converters.append(None)
+            elif field is not None and hasattr(field, 'convert'):
+                converters.append(field.convert)
+            else:
+                converters.append(self.conn.to_python)
+        return ResultLayout(names, tuple(converters), fetched_fields)
+
+    @log_query
+    def search(self, query_string, **kwargs):
+        if len(query_string) == 0:
+            return {
+                'results': [],
+                'hits': 0,
+            }
+
+        raw_results = self.search_raw(query_string, **kwargs)
+
+        return self.process_search_results(raw_results, **kwargs)
+
+    def count(self, query_string, **kwargs):
+        """
+        Count the matching documents, without fetching or processing hits.
+
+        """
+
+        if len(query_string) == 0:
+            return 0
+
+        raw_results = self.search_without_hits(query_string, {'size': 0}, **kwargs)
+        return raw_results.get('hits', {}).get('total', 0)
+
+    def exists(self, query_string, **kwargs):
+        """
+        Check if there are any matching documents. Each shard can stop
+        searching as soon as it has found one.
+
+        """
+
+        if len(query_string) == 0:
+            return False
+
+        raw_results = self.search_without_hits(query_string, {'size': 0, 'terminate_after': 1}, **kwargs)
+        return raw_results.get('hits', {}).get('total', 0) > 0
+
+    def search_facets(self, query_string, **kwargs):
+        """
+        Get the facet counts and total number of hits of a search, without
+        fetching any hits or building any results.
+
+        """
+
+        if len(query_string) == 0:
+            return {
+                'results': [],
+                'hits': 0,
+            }
+
+        raw_results = self.search_without_hits(query_string, {'size': 0}, keep_facets=True, **kwargs)
+        return self._process_results(raw_results)
+
+    def search_without_hits(self, query_string, query_params, keep_facets=False, **kwargs):
+        """
+        Perform a search for the total number of hits (and optionally the
+        facets) only, without any sorting or highlighting.
+
+        """
+
+        index_names, search_kwargs = self.build_search_request(query_string, **kwargs)[:2]
+
+        for key in ('sort', 'highlight'):
+            search_kwargs.pop(key, None)
+
+        if not keep_facets:
+            for key in ('facets', 'aggs', 'aggregations'):
+                search_kwargs.pop(key, None)
+
+        return self.send_search(query_string, index_names, search_kwargs, query_params, cache_timeout=kwargs.get('cache_timeout'))
+
+    def multi_search(self, searches):
+        """
+        Perform many searches in a single request. Accepts a sequence of
+        (query_string, kwargs) pairs, and returns the unprocessed response
+        data for each of them, in the same order.
+
+        """
+
+        lines = []
+        for query_string, kwargs in searches:
+            index_names, search_kwargs, query_params = self.build_search_request(query_string, **kwargs)
+            header = {
+                'index': list(index_names),
+                'type': 'modelresult',
+            }
+            body = dict(search_kwargs)
+            body.update(query_params)
+            lines.append(self.conn._encode_json(header))
+            lines.append(self.conn._encode_json(body))
 
         try:
-            raw_results = self.conn.search(None, search_kwargs, indexes=index_names, doc_types=['modelresult'], **query_params)
+            response_data = self.conn._send_request('GET', ['_msearch'], '\n'.join(lines) + '\n', encode_body=False)
+            responses = response_data['responses']
         except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
             if not self.silently_fail:
                 raise
 
-            self.log.error("Failed to query Elasticsearch using '%s': %s", query_string, e)
-            raw_results = {}
+            self.log.error("Failed to multi search Elasticsearch: %s", e)
+            responses = [{} for search in searches]
+
+        raw_results = []
+        for (query_string, kwargs), response in zip(searches, responses):
+            if 'error' in response:
+                if not self.silently_fail:
+                    raise pyelasticsearch.ElasticSearchError(response['error'])
+                self.log.error("Failed to query Elasticsearch using '%s': %s", query_string, response['error'])
+                response = {}
+            raw_results.append(response)
 
-        return self._process_results(raw_results, highlight=kwargs.get('highlight'), result_class=kwargs.get('result_class', SearchResult))
+        return raw_results
 
     def more_like_this(self, model_instance, additional_query_string=None,
                        start_offset=0, end_offset=None, models=None,
@@ -399,12 +1384,165 @@ class ElasticsearchSearchQuery(elasticsearch_backend.ElasticsearchSearchQuery):
     def __init__(self, *args, **kwargs):
         super(ElasticsearchSearchQuery, self).__init__(*args, **kwargs)
         self._direct = {}
+        self._only_fields = None
+        self._cache_timeout = None
+        self._compact = False
+        self._compile_filters = None
+        self._base_filter = None
+        self._base_node = None
+        self._split_filters = None
+        self._prepared_results = {}
 
     def _clone(self, *args, **kwargs):
         clone = super(ElasticsearchSearchQuery, self)._clone(*args, **kwargs)
         clone._direct = self._direct
+        clone._only_fields = self._only_fields
+        clone._cache_timeout = self._cache_timeout
+        clone._compact = self._compact
+        clone._compile_filters = self._compile_filters
+        clone._base_filter = self._base_filter
+        clone._base_node = self._base_node
         return clone
 
+    def prepare_results(self, start_offset, end_offset, raw_results):
+        """
+        Provide the response data for a search that was performed elsewhere
+        (e.g. in a multi search), to be used when this slice of results is
+        next requested instead of sending the search again. This can also be
+        an AsyncResult for a search which is still running.
+
+        """
+        self._prepared_results[(start_offset, end_offset)] = raw_results
+
+    def get_prepared_results(self, start_offset, end_offset):
+        """
+        Get the prepared response data for a slice of results, waiting for
+        it if the search is still running. Slices which are inside of a
+        prepared slice use the matching part of its hits.
+
+        """
+
+        for (prepared_start, prepared_end), raw_results in self._prepared_results.items():
+
+            if start_offset < prepared_start or end_offset is None or end_offset > prepared_end:
+                continue
+
+            if not isinstance(raw_results, dict):
+                # Wait for a search that is running in another thread.
+                raw_results = self._prepared_results[(prepared_start, prepared_end)] = raw_results.get()
+
+            if (start_offset, end_offset) == (prepared_start, prepared_end):
+                del self._prepared_results[(prepared_start, prepared_end)]
+                return raw_results
+
+            if not raw_results:
+                return raw_results
+
+            hits_data = raw_results.get('hits', {})
+            hits = hits_data.get('hits', [])[start_offset - prepared_start:end_offset - prepared_start]
+            return dict(raw_results, hits=dict(hits_data, hits=hits))
+
+        return None
+
+    def wait_for_prepared_results(self):
+        """
+        Wait for any prepared searches that are still running, and use their
+        hit count, rather than sending another search to count the results.
+
+        """
+        for key, raw_results in self._prepared_results.items():
+            if not isinstance(raw_results, dict):
+                raw_results = self._prepared_results[key] = raw_results.get()
+            if self._hit_count is None and raw_results:
+                self._hit_count = raw_results.get('hits', {}).get('total', 0)
+
+    def run(self, spelling_query=None, **kwargs):
+        """Use prepared response data when it is available."""
+
+        raw_results = self.get_prepared_results(self.start_offset or 0, self.end_offset)
+        if raw_results is None:
+            return super(ElasticsearchSearchQuery, self).run(spelling_query, **kwargs)
+
+        search_kwargs = self.build_params(spelling_query, **kwargs)
+        results = self.backend.process_search_results(raw_results, **search_kwargs)
+
+        self._results = results.get('results', [])
+        self._hit_count = results.get('hits', 0)
+        self._facet_counts = self.post_process_facets(results)
+        self._spelling_suggestion = results.get('spelling_suggestion', None)
+
+    def get_count(self):
+        """Get the count without fetching any results, when possible."""
+
+        self.wait_for_prepared_results()
+
+        if self._hit_count is None and not (self._more_like_this or self._raw_query):
+            self._hit_count = self.backend.count(self.build_query(), **self.build_params())
+
+        return super(ElasticsearchSearchQuery, self).get_count()
+
+    def run_facets(self):
+        """Get the facet counts without fetching any results."""
+        results = self.backend.search_facets(self.build_query(), **self.build_params())
+        self._hit_count = results.get('hits', 0)
+        self._facet_counts = self.post_process_facets(results)
+        return self._facet_counts
+
+    def has_results(self):
+        """Check if there are any results, using known counts if possible."""
+
+        self.wait_for_prepared_results()
+
+        if self._hit_count is not None:
+            return self._hit_count > 0
+
+        if self._more_like_this or self._raw_query:
+            return self.get_count() > 0
+
+        return self.backend.exists(self.build_query(), **self.build_params())
+
+    def build_query(self):
+        """Leave out the filters which are compiled into filter clauses."""
+
+        if not self.use_compiled_filters():
+            return super(ElasticsearchSearchQuery, self).build_query()
+
+        # This is the same as the original build_query, but for the
+        # remaining filters rather than self.query_filter.
+        final_query = self.split_filters()[0].as_query_string(self.build_query_fragment)
+
+        if not final_query:
+            final_query = self.matching_all_fragment()
+
+        if self.boost:
+            boost_list = []
+            for boost_word, boost_value in self.boost.items():
+                boost_list.append(self.boost_fragment(boost_word, boost_value))
+            final_query = '%s %s' % (final_query, ' '.join(boost_list))
+
+        return final_query
+
+    def use_compiled_filters(self):
+        if self._compile_filters is None:
+            return self.backend.compile_filters
+        return self._compile_filters
+
+    def split_filters(self):
+        """
+        Return a SearchNode of the full text filters, and a compiled filter
+        clause for the other filters (or None). See backends.filters.
+
+        The result is reused until the filters of this query change.
+
+        """
+        if self._split_filters is None or self._split_filters[0] is not self.query_filter:
+            self._split_filters = (self.query_filter, FilterCompiler(self).split(self.query_filter))
+        return self._split_filters[1]
+
+    def add_filter(self, *args, **kwargs):
+        self._split_filters = None
+        super(ElasticsearchSearchQuery, self).add_filter(*args, **kwargs)
+
     def build_query_fragment(self, field, filter_type, value):
 
         optional = isinstance(value, Optional)
@@ -426,9 +1564,85 @@ class ElasticsearchSearchQuery(elasticsearch_backend.ElasticsearchSearchQuery):
         """Adds "direct" instructions for ElasticSearch."""
         self._direct = merge_dictionaries(self._direct, kwargs)
 
+    def set_only_fields(self, field_names):
+        """Only fetch the specified stored fields for each result."""
+        self._only_fields = tuple(field_names)
+
+    def set_cache_timeout(self, timeout):
+        """Cache the search responses for this number of seconds."""
+        self._cache_timeout = timeout
+
+    def set_compact(self, compact=True):
+        """Create compact, lazily converted results."""
+        self._compact = compact
+
+    def set_compile_filters(self, compile_filters=True):
+        """Compile filters into filter clauses, overriding the connection option."""
+        self._compile_filters = compile_filters
+        if not compile_filters:
+            self.restore_base_filter()
+
+    def set_base_filter(self, base_filter, base_node):
+        """
+        Use a precompiled filter clause in addition to the filters of this
+        query. The base_node is the SearchNode it was compiled from, which
+        is used when the filters have to go back into the query string.
+        Both are shared by clones, so they must not be modified.
+
+        """
+        if 'bool' in base_filter:
+            # Let Elasticsearch cache the combined filter too.
+            base_filter = {'bool': dict(base_filter['bool'], _cache=True)}
+        self._base_filter = base_filter
+        self._base_node = base_node
+
+    def restore_base_filter(self):
+        """Move the filters of the base filter back into the query."""
+        if self._base_filter:
+            self.add_filter(self._base_node)
+            self._base_filter = None
+            self._base_node = None
+
+    def combine(self, rhs, connector=SQ.AND):
+        """
+        Combine the filters of another query with this one, including their
+        base filters. A base filter applies to the whole query, so it can be
+        kept for an AND, but different ones can't be kept for an OR.
+
+        """
+
+        if rhs._base_filter and rhs._base_filter != self._base_filter:
+            if connector == SQ.AND and not self._base_filter:
+                self._base_filter = rhs._base_filter
+                self._base_node = rhs._base_node
+            else:
+                rhs = rhs._clone()
+                rhs.restore_base_filter()
+                if connector == SQ.OR:
+                    self.restore_base_filter()
+        elif self._base_filter and connector == SQ.OR and not rhs._base_filter:
+            self.restore_base_filter()
+
+        super(ElasticsearchSearchQuery, self).combine(rhs, connector)
+
     def build_params(self, *args, **kwargs):
         search_kwargs = super(ElasticsearchSearchQuery, self).build_params(*args, **kwargs)
         search_kwargs['direct'] = self._direct
+        if self._only_fields:
+            search_kwargs['only_fields'] = self._only_fields
+        if self._cache_timeout:
+            search_kwargs['cache_timeout'] = self._cache_timeout
+        if self._compact:
+            search_kwargs['compact'] = True
+        compiled_filters = []
+        if self._base_filter:
+            compiled_filters.append(self._base_filter)
+        if self.use_compiled_filters():
+            compiled_filter = self.split_filters()[1]
+            if compiled_filter:
+                compiled_filters.append(compiled_filter)
+        if compiled_filters:
+            search_kwargs['compiled_filter'] = combine_filters(compiled_filters)
         return search_kwargs
 
 
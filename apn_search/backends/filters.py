@@ -0,0 +1,208 @@
+"""
+Compiles search filters into Elasticsearch filter clauses.
+
+Normally every filter() becomes part of the query string, so Elasticsearch
+parses and scores all of it for every search, and can't use its filter cache.
+With the COMPILE_FILTERS option of a HAYSTACK connection (or the
+compile_filters() method of SearchQuerySet), exact, range, ModelInput and
+Optional filters are moved into a "filtered" query instead, leaving only the
+genuine full text filters in the scored query string.
+
+Exact values for fields that are not analyzed become term/terms filters.
+Analyzed fields use cached phrase query filters, so they match exactly the
+same documents as the query string did.
+
+"""
+
+import datetime
+import threading
+
+import haystack
+
+from django.db.models import Model, Manager
+from django.db.models.query import QuerySet
+
+from apn_search.inputs import ModelInput, Optional
+
+
+_field_mappings = {}
+_field_mappings_lock = threading.Lock()
+
+
+def get_field_mappings(backend):
+    """
+    Get the field mappings of every indexed field of a connection. They are
+    built once and then shared, until the unified index is rebuilt.
+
+    """
+
+    using = backend.connection_alias
+    unified_index = haystack.connections[using].get_unified_index()
+    indexes = unified_index.get_indexes()
+
+    mapping_indexes, mappings = _field_mappings.get(using, (None, None))
+    if mapping_indexes is not indexes:
+        with _field_mappings_lock:
+            content_field_name, mappings = backend.build_schema(unified_index.all_searchfields())
+            _field_mappings[using] = (indexes, mappings)
+
+    return mappings
+
+
+def combine_filters(clauses):
+    """Combine filter clauses so that all of them must match."""
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {'bool': {'must': list(clauses)}}
+
+
+class FilterCompiler(object):
+
+    range_filter_types = ('gt', 'gte', 'lt', 'lte')
+    scalar_types = (bool, int, long, float, datetime.date)
+
+    def __init__(self, query):
+        self.query = query
+        self.backend = query.backend
+        self.unified_index = haystack.connections[query._using].get_unified_index()
+        self.mappings = get_field_mappings(self.backend)
+
+    def split(self, node):
+        """
+        Split a SearchNode into a node of the filters that must remain in
+        the query string, and a filter clause for the rest (or None).
+
+        """
+
+        remaining = node.__class__()
+        clauses = []
+
+        if node.connector == 'AND' and not node.negated:
+            for child in node.children:
+                clause = self.compile_child(node, child)
+                if clause is None:
+                    remaining.children.append(child)
+                else:
+                    clauses.append(clause)
+        else:
+            clause = self.compile_child(None, node)
+            if clause is None:
+                remaining = node
+            else:
+                clauses.append(clause)
+
+        return remaining, combine_filters(clauses)
+
+    def compile_child(self, parent, child):
+        """Compile a child of a SearchNode, or return None if it can't be."""
+
+        if hasattr(child, 'as_query_string'):
+            clauses = []
+            for grandchild in child.children:
+                clause = self.compile_child(child, grandchild)
+                if clause is None:
+                    return None
+                clauses.append(clause)
+            if not clauses:
+                return None
+            if len(clauses) == 1:
+                clause = clauses[0]
+            elif child.connector == 'OR':
+                clause = {'bool': {'should': clauses}}
+            else:
+                clause = {'bool': {'must': clauses}}
+            if child.negated:
+                clause = {'bool': {'must_not': [clause]}}
+            return clause
+
+        expression, value = child
+        field, filter_type = parent.split_expression(expression)
+        return self.compile_filter(field, filter_type, value)
+
+    def compile_filter(self, field, filter_type, value):
+        """Compile a single filter, or return None if it is full text."""
+
+        optional = isinstance(value, Optional)
+        if optional:
+            value = value.value
+
+        if isinstance(value, (Model, Manager, QuerySet)):
+            value = ModelInput(value)
+
+        if field == 'content':
+            return None
+
+        if hasattr(value, 'input_type_name'):
+            # Only exact inputs (including ModelInput) can be compiled.
+            if value.input_type_name != 'exact':
+                return None
+            if filter_type == 'contains':
+                filter_type = 'exact'
+            value = value.query_string
+        elif filter_type == 'contains' and isinstance(value, self.scalar_types):
+            # Values like is_live=True are not full text.
+            filter_type = 'exact'
+
+        field_name = self.unified_index.get_index_fieldname(field)
+
+        if filter_type == 'exact':
+            if isinstance(value, (list, tuple, set)):
+                clause = self.build_exact_filter(field_name, value)
+            else:
+                clause = self.build_exact_filter(field_name, [value])
+        elif filter_type == 'in':
+            if not isinstance(value, (list, tuple, set)):
+                return None
+            clause = self.build_exact_filter(field_name, value)
+        elif filter_type in self.range_filter_types:
+            clause = {'range': {field_name: {filter_type: self.convert(value)}}}
+        elif filter_type == 'range':
+            start, end = value
+            clause = {'range': {field_name: {'gte': self.convert(start), 'lte': self.convert(end)}}}
+        else:
+            return None
+
+        if clause is None:
+            return None
+
+        if optional:
+            clause = {'bool': {'should': [clause, {'missing': {'field': field_name}}]}}
+
+        return clause
+
+    def build_exact_filter(self, field_name, values):
+        """Build a filter that matches any of the exact values."""
+
+        values = [self.convert(value) for value in values]
+        if not values:
+            return None
+
+        if self.is_analyzed(field_name):
+            clauses = [
+                {
+                    'fquery': {
+                        'query': {'match': {field_name: {'query': value, 'type': 'phrase'}}},
+                        '_cache': True,
+                    },
+                }
+                for value in values
+            ]
+            if len(clauses) == 1:
+                return clauses[0]
+            return {'bool': {'should': clauses}}
+
+        if len(values) == 1:
+            return {'term': {field_name: values[0]}}
+        return {'terms': {field_name: values}}
+
+    def is_analyzed(self, field_name):
+        """Check if a field is analyzed. Unknown fields are assumed to be."""
+        mapping = self.mappings.get(field_name)
+        if mapping is None:
+            return True
+        return mapping.get('type') == 'string' and mapping.get('index') != 'not_analyzed'
+
+    def convert(self, value):
+        return self.backend.conn.from_python(value)
@@ -0,0 +1,171 @@
+"""
+Coalesces index refreshes, so that many writes result in few refreshes.
+
+Refreshing after every write makes lots of tiny segments, and under load the
+refreshes alone can take over the I/O of the cluster. Instead, writes mark
+their index as dirty, and each dirty index gets refreshed once, either by a
+background thread or when the caller flushes (e.g. at the end of a batch).
+
+Modes:
+
+    sync        Refresh immediately after every write. Useful for tests.
+
+    batch       Refresh dirty indexes when flush() is called, or after
+                an idle timeout (see start_idle_flush).
+
+    background  Refresh dirty indexes from a background thread, at most
+                once per interval.
+
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+import pyelasticsearch
+import requests
+
+from apn_search.backends.search_cache import bump_generations
+
+
+class RefreshScheduler(object):
+
+    modes = ('sync', 'batch', 'background')
+
+    def __init__(self, conn, mode='sync', interval=1.0, search_cache=False):
+        assert mode in self.modes, 'Unknown refresh mode %r' % mode
+        self.conn = conn
+        self.mode = mode
+        self.interval = interval
+        self.search_cache = search_cache
+        self.dirty = set()
+        self.last_scheduled = 0
+        self.idle_timeout = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = os.getpid()
+        self.log = logging.getLogger('haystack')
+        if mode != 'sync':
+            atexit.register(self.flush)
+
+    def schedule(self, index_name):
+        """Mark an index as needing a refresh."""
+
+        if self.mode == 'sync':
+            self.conn.refresh(indexes=[index_name])
+            if self.search_cache:
+                bump_generations([index_name])
+            return
+
+        self.check_fork()
+
+        with self.lock:
+            self.dirty.add(index_name)
+            self.last_scheduled = time.time()
+
+        if self.mode == 'background' or self.idle_timeout:
+            self.start()
+
+    def flush(self):
+        """Refresh all of the dirty indexes now."""
+
+        self.check_fork()
+
+        with self.lock:
+            index_names = sorted(self.dirty)
+            self.dirty.clear()
+
+        if not index_names:
+            return
+
+        try:
+            self.conn.refresh(indexes=index_names)
+        except (requests.RequestException, pyelasticsearch.ElasticSearchError), e:
+            # Try again next time.
+            with self.lock:
+                self.dirty.update(index_names)
+            self.log.error("Failed to refresh Elasticsearch indexes %s: %s", ', '.join(index_names), e)
+        else:
+            # Searches cached before this refresh could have
+            # missed the changes, so invalidate them.
+            if self.search_cache:
+                bump_generations(index_names)
+
+    def start_idle_flush(self, timeout):
+        """
+        In batch mode, flush from a background thread once nothing has been
+        scheduled for this many seconds. Use this in long running processes
+        which never reach the end of a batch, e.g. the consumer daemon.
+
+        The thread is started by the next schedule() call, so that it runs
+        in the process making the writes, even when this is called before
+        a daemon forks.
+
+        """
+        if self.mode == 'batch':
+            self.idle_timeout = timeout
+
+    def check_fork(self):
+        """
+        Threads and held locks don't survive a fork, so start again with
+        a new lock and no thread when running in a forked process.
+
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.lock = threading.Lock()
+            self.thread = None
+
+    def start(self):
+        """Start the background thread if it is not already running."""
+        self.check_fork()
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='apn_search-refresh')
+                    self.thread.daemon = True
+                    self.thread.start()
+
+    def run(self):
+        while True:
+            if self.mode == 'background':
+                time.sleep(self.interval)
+                self.flush()
+            else:
+                time.sleep(self.idle_timeout)
+                if time.time() - self.last_scheduled >= self.idle_timeout:
+                    self.flush()
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_refresh_scheduler(connection_alias, conn, mode='sync', interval=1.0, search_cache=False):
+    """
+    Get the refresh scheduler for a connection. Backends can be instantiated
+    many times per connection, but they should share a single scheduler.
+
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(connection_alias)
+        if scheduler is None:
+            scheduler = _schedulers[connection_alias] = RefreshScheduler(conn, mode=mode, interval=interval, search_cache=search_cache)
+        return scheduler
+
+
+_bulk_loading = {}
+_bulk_loading_lock = threading.Lock()
+
+
+def get_bulk_loading_indexes(connection_alias):
+    """
+    Get the set of index names of a connection which are in bulk load mode,
+    and shouldn't be refreshed after writes. Like the scheduler, it is shared
+    by every backend instance of the connection.
+
+    """
+    with _bulk_loading_lock:
+        return _bulk_loading.setdefault(connection_alias, set())
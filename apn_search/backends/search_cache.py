@@ -0,0 +1,80 @@
+"""
+A cache for search responses, which is invalidated by changes to indexes.
+
+Each index has a generation counter in Django's cache. The generations of
+the searched indexes are part of the cache key of every cached search, so
+bumping the generation of an index invalidates all of its cached searches
+at once, without having to find and delete them.
+
+Enable it with the SEARCH_CACHE option of a HAYSTACK connection. Otherwise
+cache_timeout is ignored, and writes don't have to bump any generations.
+Generations are bumped after the changed indexes have been refreshed, so
+that a search made before then can't be cached with the new generation.
+
+"""
+
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+GENERATION_KEY = 'apn_search.generation:%s'
+SEARCH_KEY = 'apn_search.search:%s:%s'
+
+# Keep generations for much longer than any cached search.
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def normalize_search(index_names, search_kwargs, query_params):
+    """
+    Return a normalised JSON string of a search request, so that identical
+    searches always produce the same string.
+
+    """
+    return json.dumps(
+        {
+            'indexes': sorted(index_names),
+            'body': search_kwargs,
+            'params': query_params,
+        },
+        sort_keys=True,
+        default=unicode,
+    )
+
+
+def get_generations(index_names):
+    """
+    Get the current generation of each index. Generations that are missing
+    from the cache are started from the current time, so that a counter
+    which was evicted does not go back to a value that was used before.
+
+    """
+
+    keys = dict((GENERATION_KEY % index_name, index_name) for index_name in index_names)
+    generations = cache.get_many(keys.keys())
+
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time.time() * 1000), GENERATION_TIMEOUT)
+            generations[key] = cache.get(key)
+
+    return [(keys[key], generations[key]) for key in sorted(keys)]
+
+
+def bump_generations(index_names):
+    """Invalidate all of the cached searches for the indexes."""
+    for index_name in index_names:
+        key = GENERATION_KEY % index_name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), GENERATION_TIMEOUT)
+
+
+def get_search_cache_key(index_names, search_kwargs, query_params):
+    """Make the cache key for a search request, at the current generation."""
+    search_hash = hashlib.md5(normalize_search(index_names, search_kwargs, query_params)).hexdigest()
+    generation_hash = hashlib.md5(repr(get_generations(index_names))).hexdigest()
+    return SEARCH_KEY % (search_hash, generation_hash)
@@ -0,0 +1,230 @@
+"""
+HTTP transport for the ElasticSearch client, using persistent pooled
+connections which are shared by every backend instance of a connection.
+
+Configure it with the CONNECTION_POOL option of a HAYSTACK connection:
+
+    'CONNECTION_POOL': {
+        'POOL_SIZE': 10,        # Number of hosts to keep connection pools for.
+        'MAX_PER_HOST': 20,     # Maximum connections to keep open per host.
+        'KEEP_ALIVE': 60,       # Seconds before idle sockets send TCP keep-alive probes.
+        'BLOCK': False,         # Wait for a free connection instead of opening extra ones.
+    }
+
+Request bodies larger than the GZIP_THRESHOLD option (in bytes) of the
+connection are compressed with gzip. Responses are compressed by
+ElasticSearch when it has http.compression enabled.
+
+"""
+
+import gzip
+import socket
+import threading
+import time
+import zlib
+
+from cStringIO import StringIO
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+try:
+    from requests.packages.urllib3.connection import HTTPConnection
+except ImportError:
+    HTTPConnection = None
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that can report statistics about its connection pools,
+    and compresses large request bodies.
+
+    """
+
+    def __init__(self, keep_alive=None, gzip_threshold=None, **kwargs):
+        self.keep_alive = keep_alive
+        self.gzip_threshold = gzip_threshold
+        self.compression_stats = CompressionStats()
+        super(PooledAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+
+        body = request.body
+        if self.gzip_threshold is not None and isinstance(body, basestring) and len(body) >= self.gzip_threshold:
+            if 'Content-Encoding' not in request.headers:
+                started = time.time()
+                compressed = gzip_compress(body)
+                self.compression_stats.add_request(len(body), len(compressed), time.time() - started)
+                request.body = compressed
+                request.headers['Content-Encoding'] = 'gzip'
+                request.headers['Content-Length'] = str(len(compressed))
+
+        response = super(PooledAdapter, self).send(request, **kwargs)
+
+        if response.headers.get('Content-Encoding') == 'gzip' and not kwargs.get('stream'):
+            # Read the compressed body and decompress it here, rather than
+            # letting requests do it, to measure the decompression by itself.
+            wire_data = response.raw.read(decode_content=False)
+            started = time.time()
+            content = gzip_decompress(wire_data)
+            self.compression_stats.add_response(len(wire_data), len(content), time.time() - started)
+            response._content = content
+            response._content_consumed = True
+
+        return response
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = self.get_socket_options()
+        if socket_options:
+            kwargs['socket_options'] = socket_options
+        super(PooledAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def get_socket_options(self):
+        """Enable TCP keep-alive probes, when supported."""
+
+        if not self.keep_alive or not hasattr(HTTPConnection, 'default_socket_options'):
+            return None
+
+        options = list(HTTPConnection.default_socket_options)
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(self.keep_alive)))
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, int(self.keep_alive)))
+        return options
+
+    def get_stats(self):
+        """
+        Return statistics for each host's connection pool:
+
+            created     Connections opened since the pool was created.
+            in_use      Connections currently checked out of the pool.
+            idle        Open connections waiting in the pool to be reused.
+            requests    Requests made through the pool.
+
+        """
+
+        stats = {}
+
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            queued = list(pool.pool.queue) if pool.pool else []
+            stats['%s://%s:%s' % (pool.scheme, pool.host, pool.port)] = {
+                'created': pool.num_connections,
+                'in_use': pool.pool.maxsize - len(queued) if pool.pool else 0,
+                'idle': len([conn for conn in queued if conn is not None]),
+                'requests': pool.num_requests,
+            }
+
+        return stats
+
+
+class CompressionStats(object):
+    """
+    Counts the bytes saved by compression and the time it took. The times
+    are measured with the wall clock around each call, so they include any
+    time that the thread spent waiting for other threads.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests_compressed = 0
+        self.request_bytes = 0
+        self.request_bytes_sent = 0
+        self.compress_seconds = 0.0
+        self.decompress_seconds = 0.0
+        self.responses_compressed = 0
+        self.response_bytes = 0
+        self.response_bytes_received = 0
+
+    def add_request(self, size, compressed_size, seconds):
+        with self.lock:
+            self.requests_compressed += 1
+            self.request_bytes += size
+            self.request_bytes_sent += compressed_size
+            self.compress_seconds += seconds
+
+    def add_response(self, compressed_size, size, seconds):
+        with self.lock:
+            self.responses_compressed += 1
+            self.response_bytes += size
+            self.response_bytes_received += compressed_size
+            self.decompress_seconds += seconds
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'requests_compressed': self.requests_compressed,
+                'request_bytes_saved': self.request_bytes - self.request_bytes_sent,
+                'compress_seconds': self.compress_seconds,
+                'responses_compressed': self.responses_compressed,
+                'response_bytes_saved': self.response_bytes - self.response_bytes_received,
+                'decompress_seconds': self.decompress_seconds,
+            }
+
+
+def gzip_compress(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    output = StringIO()
+    gzip_file = gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6)
+    try:
+        gzip_file.write(data)
+    finally:
+        gzip_file.close()
+    return output.getvalue()
+
+
+def gzip_decompress(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(key, POOL_SIZE=10, MAX_PER_HOST=10, KEEP_ALIVE=None, BLOCK=False, GZIP_THRESHOLD=None):
+    """
+    Get the shared requests session for a connection key. Backends can be
+    instantiated many times for each connection, but they should all reuse
+    the same connections.
+
+    """
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            adapter = PooledAdapter(
+                keep_alive=KEEP_ALIVE,
+                gzip_threshold=GZIP_THRESHOLD,
+                pool_connections=POOL_SIZE,
+                pool_maxsize=MAX_PER_HOST,
+                pool_block=BLOCK,
+            )
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return session
+
+
+def get_pool_stats(session):
+    """Return the connection pool statistics of a session, by host."""
+    stats = {}
+    for adapter in set(session.adapters.values()):
+        if isinstance(adapter, PooledAdapter):
+            stats.update(adapter.get_stats())
+    return stats
+
+
+def get_compression_stats(session):
+    """Return the compression statistics of a session."""
+    for adapter in set(session.adapters.values()):
+        if isinstance(adapter, PooledAdapter):
+            return adapter.compression_stats.as_dict()
+    return {}
@@ -17,6 +17,7 @@ from django.db import connections, DatabaseError
 from mq.daemon import ConsumerDaemon
 
 from apn_search.update import update_object
+from apn_search.utils.indexes import get_backend
 
 
 class MessageHandler(object):
@@ -85,8 +86,13 @@ class MessageHandler(object):
                 queue.ack(message_id)
 
 
-def start_daemon(message_queue, queue_name=settings.APN_SEARCH_QUEUE, handler_class=MessageHandler):
+def start_daemon(message_queue, queue_name=settings.APN_SEARCH_QUEUE, handler_class=MessageHandler, idle_flush=5.0):
     logging.info('Starting search update consumer daemon using %s.' % message_queue)
+    # The daemon never finishes, so refresh the indexes that were changed
+    # whenever it goes idle, if using the batch refresh mode. The thread
+    # for this starts with the first update, after the daemon has forked.
+    refresh_scheduler = get_backend().refresh_scheduler
+    refresh_scheduler.start_idle_flush(idle_flush)
     consumer = ConsumerDaemon(
         message_queue=message_queue,
         queue_name=queue_name,
@@ -96,13 +102,20 @@ def start_daemon(message_queue, queue_name=settings.APN_SEARCH_QUEUE, handler_cl
             'consume_search_updates.pid'
         ),
     )
-    consumer.start()
+    try:
+        consumer.start()
+    finally:
+        refresh_scheduler.flush()
 
 
 def start_cron(message_queue, queue_name=settings.APN_SEARCH_QUEUE, handler_class=MessageHandler):
     """Consume and process all search updates and then quit."""
     logging.info('Starting search update script.')
     message_handler = handler_class().process_message
-    with message_queue.open(queue_name) as queue:
-        for message_body, message_id in queue:
-            message_handler(message_body, message_id, queue)
+    try:
+        with message_queue.open(queue_name) as queue:
+            for message_body, message_id in queue:
+                message_handler(message_body, message_id, queue)
+    finally:
+        # Refresh the indexes that were changed, if using the batch refresh mode.
+        get_backend().refresh_scheduler.flush()
@@ -13,6 +13,13 @@ from apn_search.utils.encoders import BasicEncoder
 
 class CommonSearchIndex(indexes.SearchIndex):
 
+    # Set this to True when filters() always returns the same filters,
+    # so that model_search can reuse the searches built with them. This
+    # is off by default, because filters like "publish_date__lte=now"
+    # change between calls. It saves the most with the COMPILE_FILTERS
+    # connection option, which compiles the filters once per search.
+    cacheable_filters = False
+
     def _manage_signal_handler(self, signal_method):
         """
         Manage all signal handlers for this index through this method. Provide
@@ -59,14 +66,26 @@ class CommonSearchIndex(indexes.SearchIndex):
         self.prepared_data = BasicEncoder(self.prepared_data).encode()
         return self.prepared_data
 
-    def get_index_name(self, using=None):
+    def get_alias_name(self, using=None):
+        """
+        Return the unversioned name that is used to read from and write to
+        the index when the backend's USE_ALIASES option is enabled.
+
+        """
         base_index_name = self._get_backend(using).index_name
         model = self.get_model()
-        version = self.get_index_version()
         parts = (
             base_index_name,
             model._meta.app_label,
             model._meta.module_name,
+        )
+        return '-'.join(str(part) for part in parts if part)
+
+    def get_index_name(self, using=None):
+        alias_name = self.get_alias_name(using)
+        version = self.get_index_version()
+        parts = (
+            alias_name,
             version,
         )
         return '-'.join(str(part) for part in parts if part)
@@ -116,6 +135,7 @@ class CommonSearchIndex(indexes.SearchIndex):
         """
         Return a dictionary of filters for searching on this content type.
         These filters should ensure that only live objects are returned.
+        See cacheable_filters for when model_search may reuse them.
 
         Implement this in each Index class.
 
@@ -53,7 +53,7 @@ class Command(LabelCommand):
             print 'Getting indexed ids...'
         model_search_results = SearchQuerySet().models(model)
         show_progress = self.verbosity >= 2
-        indexed_ids = model_search_results.get_django_ids(verbose=show_progress)
+        indexed_ids = model_search_results.get_django_ids(verbose=show_progress, scroll='5m')
         indexed_ids = set(indexed_ids)
 
         leftovers = indexed_ids - db_ids
@@ -70,11 +70,13 @@ class Command(LabelCommand):
     def remove_leftovers(self, model, pks):
         backend = get_backend()
         label = model_label(model)
+        document_ids = []
         for pk in pks:
             document_id = '%s.%s' % (label, pk)
             if self.verbosity >= 2:
                 print 'Removing %s' % document_id
-            backend.remove(document_id)
+            document_ids.append(document_id)
+        backend.remove_many(document_ids)
 
 
 def get_models_from_label(label):
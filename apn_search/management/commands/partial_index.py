@@ -12,6 +12,12 @@ Usage:
 
     The usage is the same as Haystack's "update_index" management command.
 
+    Use --bulk-load to disable refreshes and replicas on the indexes while
+    they are being updated. The original settings are restored afterwards.
+    These are the live indexes that searches use, so searches will not see
+    new documents, and the indexes have no replicas to fail over to, until
+    the command has finished. Only use it when nothing else relies on them.
+
 
 Configuration:
 
@@ -62,15 +68,29 @@ from django.utils.encoding import smart_str
 
 from haystack.management.commands.update_index import Command as UpdateCommand
 
+from apn_search.management.commands.clean_index import get_models_from_label
 from apn_search.query import SearchQuerySet
-from apn_search.utils.indexes import get_unified_index
-from apn_search.utils.shell import default_text_color, do_not_print, green_text
+from apn_search.utils.indexes import get_backend, get_unified_index
+from apn_search.utils.shell import default_text_color, do_not_print, green_text, red_text
 
 
 class Command(UpdateCommand):
 
     # Set the default verbosity to 2 because it's nice to see progress.
     option_list = [option for option in UpdateCommand.option_list if option.dest != 'verbosity']
+    option_list.append(
+        make_option(
+            '--bulk-load',
+            action='store_true',
+            dest='bulk_load',
+            default=False,
+            help=(
+                'Disable refreshes and replicas on the indexes while updating them. '
+                'WARNING: these are the live indexes used by searches, which will not '
+                'see new documents or have any replicas until the command finishes.'
+            ),
+        ),
+    )
     option_list.append(
         make_option(
             '-v',
@@ -119,7 +139,25 @@ class Command(UpdateCommand):
         # Now run the update_index command as usual.
         with do_not_print(r'Skipping .+ - no index.'):
             with green_text:
-                return super(Command, self).handle(*items, **options)
+                if options.get('bulk_load'):
+                    with red_text:
+                        print 'WARNING: --bulk-load disables refreshes and replicas on the live search indexes until this command has finished.'
+                    backend = get_backend()
+                    with backend.bulk_load_mode(get_index_names(backend, items)):
+                        return super(Command, self).handle(*items, **options)
+                else:
+                    return super(Command, self).handle(*items, **options)
+
+
+def get_index_names(backend, labels):
+    """Get the names of the indexes used by the models of the labels."""
+    backend.setup_index_groups()
+    index_names = set()
+    for label in labels:
+        for model in get_models_from_label(label):
+            if model in backend.model_index_names:
+                index_names.add(backend.model_index_names[model])
+    return sorted(index_names)
 
 
 def model_label(model):
@@ -0,0 +1,233 @@
+"""
+A management command to rebuild search indexes without any downtime.
+
+Each index is loaded into a new versioned index while searches continue to
+use the current one through its alias. When the new index is complete, the
+alias is moved over to it in a single atomic operation.
+
+Usage:
+
+    apnshell reindex
+    apnshell reindex news events.event --delete-old
+
+Requirements:
+
+    * The USE_ALIASES option must be enabled on the HAYSTACK connection.
+    * Indexes must return a version from get_index_version(). Bump the
+      version when the mappings of an index change, deploy the change,
+      and then run this command.
+
+Steps for each index:
+
+    1. Create the new versioned index, with the current mappings. If the
+       backend has already created it, it is created again, so that it
+       does not contain documents from an earlier attempt.
+    2. Start sending updates to the new index as well as the old one.
+    3. Bulk load every object from index_queryset() into it.
+    4. Verify the document counts against index_queryset().
+    5. Point the alias at the new index.
+    6. Delete the old index, if --delete-old was used.
+
+Use --bulk-load to disable refreshes and replicas on the new index while it
+is loading (see the backend's bulk_load_mode method). This is safe because
+nothing is reading from the new index yet.
+
+Updates and deletes that happen while the new index is loading are written
+to both the old and the new index (see the backend's start_reindex method),
+so that none are lost when the alias is moved. This needs a cache backend
+that is shared with the processes making the updates, e.g. memcached.
+The loading only creates documents which are not in the new index yet, so
+that it never replaces a newer version written by one of those updates.
+
+"""
+
+import time
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+from django.utils.encoding import smart_str
+
+from apn_search.management.commands.clean_index import get_models_from_label
+from apn_search.utils.indexes import get_backend
+
+
+class Command(BaseCommand):
+
+    help = 'Rebuilds search indexes into new versions, then switches their aliases over.'
+    args = '[app_label or app_label.model_name ...]'
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '-b',
+            '--batch-size',
+            action='store',
+            dest='batchsize',
+            type='int',
+            default=500,
+            help='Number of objects to index in each bulk request.',
+        ),
+        make_option(
+            '--delete-old',
+            action='store_true',
+            dest='delete_old',
+            default=False,
+            help='Delete the old index after switching the alias.',
+        ),
+        make_option(
+            '--bulk-load',
+            action='store_true',
+            dest='bulk_load',
+            default=False,
+            help='Disable refreshes and replicas on the new index while loading it.',
+        ),
+        make_option(
+            '--merge-throttle',
+            action='store',
+            dest='merge_throttle',
+            default=None,
+            help='Raise the merge throttling limit while using --bulk-load (e.g. 200mb).',
+        ),
+        make_option(
+            '--no-verify',
+            action='store_false',
+            dest='verify',
+            default=True,
+            help='Switch the alias without checking the document counts.',
+        ),
+    )
+
+    def handle(self, *labels, **options):
+
+        self.verbosity = int(options['verbosity'])
+        self.batch_size = options['batchsize']
+        self.delete_old = options['delete_old']
+        self.verify = options['verify']
+        self.bulk_load = options['bulk_load']
+        self.merge_throttle = options['merge_throttle']
+
+        self.backend = backend = get_backend()
+        if not backend.use_aliases:
+            raise CommandError('The USE_ALIASES option must be enabled on the search connection.')
+
+        backend.setup_index_groups()
+
+        if labels:
+            alias_names = set()
+            for label in labels:
+                for model in get_models_from_label(label):
+                    if model in backend.model_index_names:
+                        alias_names.add(backend.model_index_names[model])
+        else:
+            alias_names = backend.index_groups.keys()
+
+        for alias_name in sorted(alias_names):
+            self.reindex(alias_name)
+
+    def reindex(self, alias_name):
+
+        backend = self.backend
+        indexes = backend.index_groups[alias_name]
+        index_name = backend.physical_index_names[alias_name]
+
+        if index_name == alias_name:
+            if self.verbosity >= 1:
+                print "Skipping '%s' - it has no index version." % alias_name
+            return
+
+        old_index_names = backend.get_alias_indexes(alias_name)
+        if index_name in old_index_names:
+            if self.verbosity >= 1:
+                print "Skipping '%s' - it already uses '%s'." % (alias_name, index_name)
+            return
+
+        # The backend creates the new index during its setup, once the new
+        # version has been deployed, so it might be there already. Nothing
+        # reads from it yet, so start again with an empty one.
+        if backend.index_exists(index_name):
+            if self.verbosity >= 1:
+                print "Recreating '%s'." % index_name
+            backend.conn.delete_index(index_name)
+        elif self.verbosity >= 1:
+            print "Creating '%s'." % index_name
+        backend.setup_index(index_name, indexes)
+
+        # Send updates to the new index too, from before it starts loading
+        # until the alias has been moved over to it. Give the other
+        # processes time to notice before loading anything.
+        backend.start_reindex(alias_name, index_name)
+        try:
+
+            if self.verbosity >= 1:
+                print 'Waiting %.1fs for updates to reach the new index.' % backend.reindex_check_interval
+            time.sleep(backend.reindex_check_interval)
+
+            if self.bulk_load:
+                with backend.bulk_load_mode([index_name], merge_throttle=self.merge_throttle):
+                    for index in indexes:
+                        self.load(index, index_name)
+            else:
+                for index in indexes:
+                    self.load(index, index_name)
+                backend.conn.refresh(indexes=[index_name])
+
+            if self.verify:
+                for index in indexes:
+                    self.check_count(index, index_name)
+
+            if self.verbosity >= 1:
+                print "Pointing '%s' at '%s'." % (alias_name, index_name)
+            backend.swap_alias(alias_name, index_name)
+
+        finally:
+            backend.finish_reindex(alias_name)
+
+        if self.delete_old:
+            for old_index_name in old_index_names:
+                if self.verbosity >= 1:
+                    print "Deleting '%s'." % old_index_name
+                backend.conn.delete_index(old_index_name)
+
+    def load(self, index, index_name):
+
+        queryset = index.index_queryset().order_by('pk')
+        total = queryset.count()
+
+        if self.verbosity >= 1:
+            print 'Indexing %d %s.' % (total, smart_str(index.get_model()._meta.verbose_name_plural))
+
+        for start in range(0, total, self.batch_size):
+
+            end = min(start + self.batch_size, total)
+
+            if self.verbosity >= 2:
+                print '  indexing %s - %d of %d.' % (start + 1, end, total)
+
+            # Updates made during the reindex have already written newer
+            # versions of their documents, so leave those alone.
+            self.backend.update(index, queryset[start:end], commit=False, index_name=index_name, op_type='create')
+
+            if settings.DEBUG:
+                reset_queries()
+
+    def check_count(self, index, index_name):
+
+        model = index.get_model()
+        expected = index.index_queryset().count()
+        actual = self.backend.count_model_documents(index_name, model)
+
+        if actual != expected:
+            raise CommandError(
+                "'%s' has %d %s but the database has %d. "
+                "The alias has not been changed." % (
+                    index_name,
+                    actual,
+                    smart_str(model._meta.verbose_name_plural),
+                    expected,
+                )
+            )
+
+        if self.verbosity >= 2:
+            print 'Verified %d %s.' % (actual, smart_str(model._meta.verbose_name_plural))
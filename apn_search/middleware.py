@@ -0,0 +1,21 @@
+from apn_search.backends.dedup import search_deduplication
+
+
+class SearchDeduplicationMiddleware(object):
+    """
+    Reuses the responses of identical searches within each request.
+    See apn_search.backends.dedup for details.
+
+    """
+
+    def process_request(self, request):
+        search_deduplication.begin(request.path)
+
+    def process_response(self, request, response):
+        if search_deduplication.active:
+            search_deduplication.end()
+        return response
+
+    def process_exception(self, request, exception):
+        if search_deduplication.active:
+            search_deduplication.end()
@@ -1,18 +1,19 @@
+import functools
 import json
 import logging
 
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 
 from haystack import connections, query
-from haystack.exceptions import HaystackError
-
-from lazymodel import LazyModel
+from haystack.constants import ITERATOR_LOAD_PER_QUERY
 
 from apn_search.fields import ForeignKeyField, ManyToManyField
 from apn_search.inputs import ModelInput
 from apn_search.results import SearchResult
+from apn_search.utils.facets import load_facet_values
 from apn_search.utils.geo import Distance, point_from_lat_long
+from apn_search.utils.indexes import get_model_table
+from apn_search.utils.objects import prefetch_objects, prefetch_related_fields
 
 
 class DirectSearchQuerySet(query.SearchQuerySet):
@@ -88,6 +89,23 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
     def __init__(self, *args, **kwargs):
         super(SearchQuerySet, self).__init__(*args, **kwargs)
         self.query.set_result_class(self.create_result)
+        self._prefetch_objects = None
+        self._prefetch_related_fields = ()
+
+    def _clone(self, klass=None):
+        clone = super(SearchQuerySet, self)._clone(klass=klass)
+        clone._prefetch_objects = self._prefetch_objects
+        clone._prefetch_related_fields = self._prefetch_related_fields
+        return clone
+
+    def _fill_cache(self, start, end, **kwargs):
+        filled = super(SearchQuerySet, self)._fill_cache(start, end, **kwargs)
+        if self._result_cache:
+            if self._prefetch_objects is not None:
+                prefetch_objects(self._result_cache[start:end], **self._prefetch_objects)
+            if self._prefetch_related_fields:
+                prefetch_related_fields(self._result_cache[start:end], self._prefetch_related_fields)
+        return filled
 
     def create_result(self, app_label, model_name, pk, score, **kwargs):
         """
@@ -96,18 +114,42 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
 
         """
 
-        content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
+        try:
+            result_class = get_model_table(self.query._using)[(app_label, model_name)].result_class
+        except KeyError:
+            content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
 
-        unified_index = connections[self.query._using].get_unified_index()
-        index = unified_index.get_index(content_type.model_class())
+            unified_index = connections[self.query._using].get_unified_index()
+            index = unified_index.get_index(content_type.model_class())
 
-        if hasattr(index, 'get_result_class'):
-            result_class = index.get_result_class()
-        else:
-            result_class = SearchResult
+            if hasattr(index, 'get_result_class'):
+                result_class = index.get_result_class()
+            else:
+                result_class = SearchResult
 
         return result_class(app_label, model_name, pk, score, **kwargs)
 
+    # Compact results can use the result classes of the indexes directly.
+    create_result.uses_index_result_class = True
+
+    def __nonzero__(self):
+        return self.exists()
+
+    def exists(self):
+        """
+        Check if there are any results. Unless the results or count are
+        already known, this uses a cheap search that fetches no hits.
+
+        """
+
+        if self._result_cache:
+            return True
+
+        if self._result_count is not None:
+            return self._result_count > 0
+
+        return self.query.has_results()
+
     def _convert_model_kwargs(self, **kwargs):
         """
         Converts the values of kwargs into kwargs that are useable with the
@@ -161,32 +203,63 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
             })
         return queryset
 
-    def model_facet_counts(self):
+    def model_facet_counts(self, load=True):
         """
         Get facet counts, same as facet_counts(), but convert any
-        ForeignKeyField and ManyToManyField values into LazyModel instances.
+        ForeignKeyField and ManyToManyField values into model instances.
+        The objects of all of the facets are loaded in bulk.
+
+        Use load=False to keep the identifier strings, for when only the
+        counts are needed. A loader for each of those fields is added to
+        facet_counts['loaders'], which returns the (object, count) values
+        when called.
 
         """
+        return self._convert_model_facets(self.facet_counts(), load=load)
 
-        engine = connections[self.query.backend.connection_alias]
-        unified_index = engine.get_unified_index()
-        fields = unified_index.fields
+    def facets_only(self, load=True):
+        """
+        Get facet counts, same as model_facet_counts(), but without
+        fetching any results. Use this when only the facets are needed.
 
-        facet_counts = self.facet_counts()
+        """
+        clone = self._clone()
+        return clone._convert_model_facets(clone.query.run_facets(), load=load)
 
-        facet_fields = facet_counts.get('fields', {})
+    def _convert_model_facets(self, facet_counts, load=True):
+        """
+        Convert any ForeignKeyField and ManyToManyField values of the facet
+        counts into model instances, or add loaders for them.
 
-        for field_name, values in facet_fields.items():
-            field = fields.get(field_name)
-            if isinstance(field, (ForeignKeyField, ManyToManyField)):
+        """
 
-                new_values = []
+        engine = connections[self.query.backend.connection_alias]
+        unified_index = engine.get_unified_index()
+        fields = unified_index.fields
 
-                for identifier, count in values:
-                    value = LazyModel(identifier)
-                    new_values.append((value, count))
+        facet_fields = facet_counts.get('fields', {})
 
-                facet_fields[field_name] = new_values
+        model_field_names = [
+            field_name for field_name in facet_fields
+            if isinstance(fields.get(field_name), (ForeignKeyField, ManyToManyField))
+        ]
+
+        if load:
+            # Load every field's objects at once.
+            values = []
+            for field_name in model_field_names:
+                values.extend(facet_fields[field_name])
+            loaded_values = load_facet_values(values)
+            start = 0
+            for field_name in model_field_names:
+                end = start + len(facet_fields[field_name])
+                facet_fields[field_name] = loaded_values[start:end]
+                start = end
+        else:
+            facet_counts['loaders'] = dict(
+                (field_name, functools.partial(load_facet_values, facet_fields[field_name]))
+                for field_name in model_field_names
+            )
 
         return facet_counts
 
@@ -209,6 +282,92 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
         """Returns an empty result list for the query."""
         return self._clone(klass=EmptySearchQuerySet)
 
+    def prefetch_objects(self, cache_backend=None):
+        """
+        Load the objects of each page of results in bulk when the page is
+        fetched, instead of one at a time when each result.object is used.
+        See apn_search.utils.objects for details.
+
+        Usage:
+            SearchQuerySet().filter(section=section).prefetch_objects()
+            SearchQuerySet().prefetch_objects(cache_backend=read_only_cache)
+
+        """
+        clone = self._clone()
+        clone._prefetch_objects = {'cache_backend': cache_backend}
+        return clone
+
+    def prefetch_related_fields(self, *field_names):
+        """
+        Load the objects of ForeignKeyField and ManyToManyField values in
+        bulk for each page of results, instead of one at a time when each
+        value is used. See apn_search.utils.objects for details.
+
+        Usage:
+            SearchQuerySet().prefetch_related_fields('author', 'tags')
+
+        """
+        clone = self._clone()
+        clone._prefetch_related_fields = clone._prefetch_related_fields + field_names
+        return clone
+
+    def compile_filters(self, enabled=True):
+        """
+        Compile exact, range, ModelInput and Optional filters into cacheable
+        filter clauses instead of the query string. This overrides the
+        COMPILE_FILTERS option of the connection.
+        See apn_search.backends.filters for details.
+
+        """
+        clone = self._clone()
+        clone.query.set_compile_filters(enabled)
+        return clone
+
+    def compact(self):
+        """
+        Create compact search results, which share their field layout and
+        only convert each field when it is first read. This saves the work
+        of converting fields that are never used when iterating over many
+        results, e.g. for exports.
+
+        The results behave the same way as normal results, except that they
+        are pickled as normal results. They use the result class given to
+        result_class(), or the result classes of the indexes.
+
+        """
+        clone = self._clone()
+        clone.query.set_compact()
+        return clone
+
+    def cache(self, timeout=300):
+        """
+        Cache the search responses for a number of seconds. The cached
+        responses are invalidated whenever the searched indexes change.
+        This needs the SEARCH_CACHE option of the connection, and does
+        nothing without it. See apn_search.backends.search_cache.
+
+        Usage:
+            SearchQuerySet().filter(section=section).cache(60)
+
+        """
+        clone = self._clone()
+        clone.query.set_cache_timeout(timeout)
+        return clone
+
+    def only_fields(self, *field_names):
+        """
+        Only fetch the specified stored fields for each result, instead of
+        every stored field. Accessing the other fields of their search index
+        will raise an UnfetchedField exception.
+
+        Usage:
+            SearchQuerySet().only_fields('title', 'url')
+
+        """
+        clone = self._clone()
+        clone.query.set_only_fields(field_names)
+        return clone
+
     def order_by(self, *args):
         """
         Alters the order in which the results should appear.
@@ -255,8 +414,65 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
         json_dict = self.get_backend_query()
         print json.dumps(json_dict, indent=4)
 
-    def get_document_ids(self, batch_size=500, verbose=False):
-        """Efficiently get the identifier strings of search results."""
+    def execute_async(self):
+        """
+        Start running the search in the backend's thread pool, and return
+        a handle for it straight away. Getting results from this queryset
+        will wait for the search to finish.
+
+        Usage:
+            results = SearchQuerySet().filter(section=section)
+            latest = SearchQuerySet().order_by('-created')
+            results.execute_async()
+            latest.execute_async()
+            for result in results:
+                ...
+
+        """
+
+        query = self.query
+        start, end = self._get_first_limits()
+        handle = query.backend.search_async(query.build_query(), **self._build_first_params(start, end))
+        query.prepare_results(start, end, handle)
+        return handle
+
+    def _get_first_limits(self):
+        """
+        Get the limits of the slice that would be fetched first: the slice
+        of a sliced queryset, or else the first page.
+
+        """
+
+        query = self.query
+
+        start = query.start_offset or 0
+        if query.end_offset is None:
+            end = start + ITERATOR_LOAD_PER_QUERY
+        else:
+            end = query.end_offset
+
+        return start, end
+
+    def _build_first_params(self, start, end):
+        """Build the search params for the first slice, keeping the query's own limits."""
+        search_kwargs = self.query.build_params()
+        search_kwargs['start_offset'] = start
+        search_kwargs['end_offset'] = end
+        return search_kwargs
+
+    def get_document_ids(self, batch_size=500, verbose=False, scroll=None, workers=None, slices=1):
+        """
+        Efficiently get the identifier strings of search results.
+
+        Provide a keep-alive time for the scroll argument (e.g. '5m') to
+        stream the results with a scan/scroll cursor. This is much faster
+        than the default from/size paging when there are many results.
+
+        Provide a number of workers to scroll through each index (and
+        optionally a number of slices per index) in parallel threads.
+        The identifiers are then returned in no particular order.
+
+        """
 
         backend = self.query.backend
         backend.setup()
@@ -271,21 +487,42 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
 
         # Determine which indexes to use for searching, based on the models
         # restriction of the queryset. If none are set, then use all indexes.
-        if self.query.models:
-            index_names = set()
-            for model in self.query.models:
-                try:
-                    index_names.add(backend.model_index_names[model])
-                except KeyError:
-                    message = 'No haystack index name found for %r. Mappings are %r' % (
-                        model,
-                        backend.model_index_names,
-                    )
-                    logging.warning(message, also_print=settings.DEBUG)
-            if not index_names:
-                raise HaystackError('No haystack indexes found for %s' % self.query.models)
-        else:
-            index_names = backend.index_groups.keys()
+        index_names = backend.get_index_names(self.query.models)
+
+        if workers:
+
+            if verbose:
+                print 'Scrolling through %s with %d workers' % (', '.join(index_names), workers)
+
+            hits = backend.parallel_scan(
+                search_kwargs,
+                index_names,
+                batch_size=batch_size,
+                keep_alive=scroll or '5m',
+                slices=slices,
+                workers=workers,
+            )
+
+        elif scroll:
+
+            if verbose:
+                print 'Scrolling through %s' % ', '.join(index_names)
+
+            hits = backend.scan(
+                search_kwargs,
+                index_names,
+                batch_size=batch_size,
+                keep_alive=scroll,
+            )
+
+        if workers or scroll:
+            try:
+                for hit in hits:
+                    yield hit['_id']
+            finally:
+                hits.close()
+
+            return
 
         start = 0
 
@@ -320,9 +557,16 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
             if start >= total:
                 break
 
-    def get_django_ids(self, batch_size=500, verbose=False, strict=False):
+    def get_django_ids(self, batch_size=500, verbose=False, strict=False, scroll=None, workers=None, slices=1):
         """Efficiently get the database IDs (as strings) of search results."""
-        for document_id in self.get_document_ids(batch_size=batch_size, verbose=verbose):
+        document_ids = self.get_document_ids(
+            batch_size=batch_size,
+            verbose=verbose,
+            scroll=scroll,
+            workers=workers,
+            slices=slices,
+        )
+        for document_id in document_ids:
             try:
                 app_name, model_name, object_id = document_id.split('.')
             except Exception:
@@ -335,4 +579,55 @@ class SearchQuerySet(GeoSearchQuerySet, DirectSearchQuerySet):
 
 
 class EmptySearchQuerySet(query.EmptySearchQuerySet, SearchQuerySet):
-    pass
+
+    def exists(self):
+        return False
+
+    def facets_only(self, load=True):
+        return {}
+
+
+def multi_search(*querysets):
+    """
+    Perform the searches of several SearchQuerySets in a single request,
+    filling the result cache of each one. Querysets that have been sliced
+    get that slice of results, otherwise they get their first page.
+
+    Usage:
+        results = SearchQuerySet().filter(section=section)
+        latest = SearchQuerySet().order_by('-created')
+        multi_search(results, latest)
+
+    """
+
+    searches = {}
+
+    for queryset in querysets:
+
+        query = queryset.query
+
+        # Skip searches which have already run or can't be batched.
+        if isinstance(queryset, EmptySearchQuerySet) or queryset._result_cache:
+            continue
+        if query._more_like_this or query._raw_query:
+            continue
+
+        start, end = queryset._get_first_limits()
+
+        searches.setdefault(query._using, []).append((queryset, start, end))
+
+    for using, items in searches.items():
+
+        backend = connections[using].get_backend()
+
+        search_requests = []
+        for queryset, start, end in items:
+            search_requests.append((queryset.query.build_query(), queryset._build_first_params(start, end)))
+
+        raw_results = backend.multi_search(search_requests)
+
+        for (queryset, start, end), raw in zip(items, raw_results):
+            queryset.query.prepare_results(start, end, raw)
+            queryset._fill_cache(start, end)
+
+    return querysets
@@ -1,10 +1,17 @@
+import logging
+
 from django.utils.encoding import smart_str
 
 from haystack import models
+from haystack.exceptions import NotHandled
 
 from lazymodel import LazyModel
 
 
+class UnfetchedField(AttributeError):
+    """Raised when accessing a field that was excluded by only_fields()."""
+
+
 class SearchResult(models.SearchResult):
     """Extended SearchResult class for general purposes."""
 
@@ -21,11 +28,34 @@ class SearchResult(models.SearchResult):
         try:
             return self.__dict__[attr]
         except KeyError:
-            raise AttributeError
+            fetched_fields = self._get_fetched_fields()
+            if fetched_fields is not None and attr not in fetched_fields and self._is_index_field(attr):
+                raise UnfetchedField(
+                    '%r was not fetched for this search result. '
+                    'Add it to only_fields() to use it.' % attr
+                )
+            raise AttributeError(attr)
 
     def __str__(self):
         return smart_str(unicode(self))
 
+    def _get_fetched_fields(self):
+        return self.__dict__.get('_fetched_fields')
+
+    def _is_index_field(self, name):
+        """Check if a name is a field of the search index of this result."""
+        try:
+            return name in self.searchindex.fields
+        except NotHandled:
+            return False
+
+    def _get_field(self, name):
+        """Get a field value, or None, without any fallback behaviour."""
+        return self.__dict__.get(name)
+
+    def _set_field(self, name, value):
+        self.__dict__[name] = value
+
     @property
     def _meta(self):
         return self.model._meta
@@ -56,3 +86,159 @@ class LazySearchResult(SearchResult):
 
     def __getattr__(self, attr):
         return getattr(self.object, attr)
+
+
+class ResultLayout(object):
+    """
+    The field names and converters which are shared by the compact results
+    of an index, within a page of results. A converter of None leaves the
+    value as it is.
+
+    """
+
+    __slots__ = ('names', 'positions', 'converters', 'fetched_fields')
+
+    def __init__(self, names, converters, fetched_fields=None):
+        self.names = names
+        self.positions = dict((name, position) for position, name in enumerate(names))
+        self.converters = converters
+        self.fetched_fields = fetched_fields
+
+
+# The instance attributes of a compact result.
+ROW_SLOTS = (
+    'app_label',
+    'model_name',
+    'pk',
+    'score',
+    'stored_fields',
+    '_object',
+    '_model',
+    '_verbose_name',
+    '_point_of_origin',
+    '_distance',
+    '_layout',
+    '_values',
+    '_converted',
+)
+
+_row_slots = frozenset(ROW_SLOTS)
+
+
+class CompactRow(object):
+    """
+    Keeps the fields of a search result in a list that follows a shared
+    ResultLayout, and only converts each field when it is first read.
+
+    Combine it with a result class using compact_result_class(). Result
+    classes have an instance dictionary, which the slots don't remove, so
+    this saves conversion work rather than memory.
+
+    """
+
+    __slots__ = ()
+
+    log = logging.getLogger('haystack')
+
+    def __init__(self, app_label, model_name, pk, score, layout, values):
+        self.app_label = app_label
+        self.model_name = model_name
+        self.pk = pk
+        self.score = score
+        self.stored_fields = None
+        self._object = None
+        self._model = None
+        self._verbose_name = None
+        self._point_of_origin = None
+        self._distance = None
+        self._layout = layout
+        self._values = values
+        self._converted = 0
+
+    def __getattr__(self, attr):
+
+        # An unset slot, e.g. while unpickling.
+        if attr in _row_slots:
+            raise AttributeError(attr)
+
+        position = self._layout.positions.get(attr)
+        if position is None:
+            return super(CompactRow, self).__getattr__(attr)
+
+        return self._get_value(position)
+
+    def __reduce__(self):
+        # Compact result classes are created on the fly, so pickle
+        # these as instances of the normal result class instead.
+        fields = self.get_additional_fields()
+        if self._point_of_origin is not None:
+            fields['_point_of_origin'] = self._point_of_origin
+            fields['_distance'] = self._distance
+        return (
+            _rebuild_result,
+            (self._result_class, self.app_label, self.model_name, self.pk, self.score, fields),
+        )
+
+    def _get_fetched_fields(self):
+        return self._layout.fetched_fields
+
+    def _get_field(self, name):
+        position = self._layout.positions.get(name)
+        if position is None:
+            return super(CompactRow, self)._get_field(name)
+        return self._get_value(position)
+
+    def _set_field(self, name, value):
+        position = self._layout.positions.get(name)
+        if position is None:
+            super(CompactRow, self)._set_field(name, value)
+        else:
+            self._values[position] = value
+            self._converted |= 1 << position
+
+    def _get_value(self, position):
+        value = self._values[position]
+        flag = 1 << position
+        if not self._converted & flag:
+            converter = self._layout.converters[position]
+            if converter is not None:
+                value = self._values[position] = converter(value)
+            self._converted |= flag
+        return value
+
+    def get_additional_fields(self):
+        return dict(
+            (name, self._get_value(position))
+            for position, name in enumerate(self._layout.names)
+        )
+
+    def get_identifier(self):
+        return self._get_value(self._layout.positions['id'])
+
+
+def _rebuild_result(result_class, app_label, model_name, pk, score, fields):
+    return result_class(app_label, model_name, pk, score, **fields)
+
+
+_compact_classes = {}
+
+
+def compact_result_class(result_class):
+    """
+    Get the compact version of a result class. It behaves the same way,
+    including its __getattr__ method for fields that are not in the row.
+
+    """
+    try:
+        return _compact_classes[result_class]
+    except KeyError:
+        compact_class = _compact_classes[result_class] = type(
+            'Compact%s' % result_class.__name__,
+            (CompactRow, result_class),
+            {
+                '__module__': result_class.__module__,
+                '__slots__': ROW_SLOTS,
+                '_result_class': result_class,
+            },
+        )
+        return compact_class
@@ -1,9 +1,25 @@
 # TODO: enable tests again and make some more
 
+import pickle
+import threading
+
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 
+from haystack.backends import SQ
+
+from apn_search.backends.bulk import BulkResult
+from apn_search.backends.dedup import SearchDeduplication
+from apn_search.backends.elasticsearch_backend import ElasticsearchSearchBackend
+from apn_search.backends.filters import FilterCompiler
+from apn_search.inputs import Optional
 from apn_search.query import SearchQuerySet
+from apn_search.results import ResultLayout, SearchResult, compact_result_class
+from apn_search.utils.dictionaries import flatten_dictionary
+from apn_search.utils.facets import load_facet_values
 from apn_search.utils.geo import Distance, point_from_lat_long, point_from_long_lat
+from apn_search.utils.objects import load_identifiers
+from apn_search.utils.threads import merge_iterators
 
 
 class LocationQueryTests(TestCase):
@@ -70,3 +86,359 @@ if LocationQueryTests.DISABLE_TESTS:
     for attr in dir(LocationQueryTests):
         if attr.startswith('test_'):
             delattr(LocationQueryTests, attr)
+
+
+class LoadIdentifierTests(TestCase):
+
+    def setUp(self):
+        # A content type left behind by a model that has been removed.
+        ContentType.objects.create(name='removed model', app_label='apn_search', model='removedmodel')
+        self.identifiers = [
+            'malformed',
+            'apn_search.removedmodel.1',
+            'no_such_app.no_such_model.1',
+        ]
+
+    def test_load_identifiers(self):
+        self.assertEqual(load_identifiers(self.identifiers), {})
+
+    def test_load_facet_values(self):
+        values = load_facet_values([(identifier, 2) for identifier in self.identifiers])
+        self.assertEqual([count for item, count in values], [2, 2, 2])
+        for item, count in values:
+            self.assertFalse(item)
+
+    def test_load_existing_facet_values(self):
+        content_type = ContentType.objects.get_for_model(ContentType)
+        identifier = 'contenttypes.contenttype.%d' % content_type.pk
+        self.assertEqual(load_identifiers([identifier] + self.identifiers), {identifier: content_type})
+
+        values = load_facet_values([(identifier, 3), (self.identifiers[1], 1)])
+        self.assertEqual([count for item, count in values], [3, 1])
+        item, count = values[0]
+        self.assertTrue(item)
+        self.assertEqual(item.pk, content_type.pk)
+        self.assertEqual(item.model, 'contenttype')
+        self.assertFalse(values[1][0])
+
+
+class StaticFilterCompiler(FilterCompiler):
+    """A FilterCompiler with fixed field mappings, which needs no connection."""
+
+    mappings = {
+        'title': {'type': 'string'},
+        'status': {'type': 'string', 'index': 'not_analyzed'},
+        'category': {'type': 'long'},
+        'rating': {'type': 'long'},
+    }
+
+    def __init__(self):
+        self.unified_index = self
+
+    def get_index_fieldname(self, field):
+        return field
+
+    def convert(self, value):
+        return value
+
+
+class FilterCompilerTests(TestCase):
+
+    def setUp(self):
+        self.compiler = StaticFilterCompiler()
+
+    def split(self, node):
+        remaining, clause = self.compiler.split(node)
+        return remaining.children, clause
+
+    def test_exact_term(self):
+        self.assertEqual(
+            self.split(SQ(status__exact='live')),
+            ([], {'term': {'status': 'live'}}),
+        )
+
+    def test_exact_phrase(self):
+        phrase = {
+            'fquery': {
+                'query': {'match': {'title': {'query': 'Big News', 'type': 'phrase'}}},
+                '_cache': True,
+            },
+        }
+        self.assertEqual(self.split(SQ(title__exact='Big News')), ([], phrase))
+
+    def test_in(self):
+        self.assertEqual(
+            self.split(SQ(category__in=[1, 2])),
+            ([], {'terms': {'category': [1, 2]}}),
+        )
+
+    def test_range(self):
+        self.assertEqual(
+            self.split(SQ(rating__gte=3)),
+            ([], {'range': {'rating': {'gte': 3}}}),
+        )
+        self.assertEqual(
+            self.split(SQ(rating__range=(1, 5))),
+            ([], {'range': {'rating': {'gte': 1, 'lte': 5}}}),
+        )
+
+    def test_optional(self):
+        clause = {
+            'bool': {
+                'should': [
+                    {'term': {'status': 'live'}},
+                    {'missing': {'field': 'status'}},
+                ],
+            },
+        }
+        self.assertEqual(self.split(SQ(status__exact=Optional('live'))), ([], clause))
+
+    def test_negated(self):
+        self.assertEqual(
+            self.split(~SQ(status__exact='draft')),
+            ([], {'bool': {'must_not': [{'term': {'status': 'draft'}}]}}),
+        )
+
+    def test_or(self):
+        clause = {
+            'bool': {
+                'should': [
+                    {'term': {'status': 'live'}},
+                    {'term': {'status': 'archived'}},
+                ],
+            },
+        }
+        self.assertEqual(
+            self.split(SQ(status__exact='live') | SQ(status__exact='archived')),
+            ([], clause),
+        )
+
+    def test_full_text(self):
+        node = SQ(content='big news') & SQ(status__exact='live')
+        children, clause = self.split(node)
+        self.assertEqual(clause, {'term': {'status': 'live'}})
+        self.assertEqual(len(children), 1)
+
+        # An OR with full text can't be compiled at all.
+        node = SQ(content='big news') | SQ(status__exact='live')
+        remaining, clause = self.compiler.split(node)
+        self.assertTrue(remaining is node)
+        self.assertEqual(clause, None)
+
+
+class BulkResultTests(TestCase):
+
+    def setUp(self):
+        self.result = BulkResult({
+            'took': 5,
+            'items': [
+                {'index': {'_index': 'test', '_id': '1', 'status': 201}},
+                {'index': {'_index': 'test', '_id': '2', 'status': 429, 'error': 'EsRejectedExecutionException[rejected execution]'}},
+                {'index': {'_index': 'test', '_id': '3', 'status': 503, 'error': 'NoShardAvailableActionException'}},
+                {'index': {'_index': 'test', '_id': '4', 'status': 400, 'error': 'MapperParsingException[failed to parse]'}},
+                {'create': {'_index': 'test', '_id': '5', 'status': 409, 'error': 'DocumentAlreadyExistsException'}},
+                {'index': {'_index': 'test', '_id': '6', 'status': 409, 'error': 'VersionConflictEngineException'}},
+                {'delete': {'_index': 'test', '_id': '7', 'status': 404, 'found': False}},
+            ],
+        })
+
+    def doc_ids(self, items):
+        return [item.doc_id for item in items]
+
+    def test_classification(self):
+        self.assertEqual(self.doc_ids(self.result.succeeded), ['1', '5', '7'])
+        self.assertEqual(self.doc_ids(self.result.retryable), ['2', '3'])
+        self.assertEqual(self.doc_ids(self.result.permanent), ['4', '6'])
+
+    def test_create_conflict(self):
+        item = self.result.items[4]
+        self.assertTrue(item.conflict)
+        self.assertFalse(item.failed)
+        self.assertFalse(item.retryable)
+
+        # Conflicts of other actions are failures.
+        item = self.result.items[5]
+        self.assertFalse(item.conflict)
+        self.assertTrue(item.failed)
+
+    def test_positions(self):
+        self.assertEqual([item.position for item in self.result.retryable], [1, 2])
+        self.assertEqual(self.result.items[1].action, 'index')
+
+    def test_empty(self):
+        result = BulkResult({'took': 1, 'items': None})
+        self.assertEqual(result.items, [])
+        self.assertEqual(result.permanent, [])
+
+
+class MergeIteratorsTests(TestCase):
+
+    def test_merge(self):
+        factories = [lambda start=start: iter(range(start, start + 100)) for start in range(0, 1000, 100)]
+        items = list(merge_iterators(factories, workers=3, buffer_size=10))
+        self.assertEqual(sorted(items), range(1000))
+
+    def test_no_iterators(self):
+        self.assertEqual(list(merge_iterators([])), [])
+
+    def test_error(self):
+
+        def failing():
+            yield 1
+            raise ValueError('failed')
+
+        merged = merge_iterators([failing, lambda: iter(range(10))], workers=2)
+        self.assertRaises(ValueError, list, merged)
+
+    def test_close(self):
+
+        closed = threading.Event()
+
+        def endless():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.set()
+
+        merged = merge_iterators([endless], workers=1, buffer_size=5)
+        self.assertEqual(merged.next(), 1)
+        merged.close()
+        self.assertTrue(closed.is_set())
+
+
+class ShardedBackend(ElasticsearchSearchBackend):
+    """A backend with a fixed number of shards, which needs no connection."""
+
+    def __init__(self, shards):
+        self.shards = shards
+
+    def get_index_settings(self, index_name):
+        return {'index.number_of_shards': str(self.shards)}
+
+
+class ShardPreferenceTests(TestCase):
+
+    def test_no_slices(self):
+        self.assertEqual(ShardedBackend(5).get_shard_preferences('test', 1), [None])
+
+    def test_slices(self):
+        self.assertEqual(
+            ShardedBackend(5).get_shard_preferences('test', 2),
+            ['_shards:0,2,4', '_shards:1,3'],
+        )
+
+    def test_more_slices_than_shards(self):
+        self.assertEqual(
+            ShardedBackend(2).get_shard_preferences('test', 4),
+            ['_shards:0', '_shards:1'],
+        )
+
+
+class FlattenDictionaryTests(TestCase):
+
+    def test_flatten(self):
+        settings = {
+            'index': {
+                'number_of_shards': '5',
+                'refresh_interval': '1s',
+                'merge': {'policy': {'segments_per_tier': '10'}},
+            },
+            'analysis': {},
+        }
+        self.assertEqual(flatten_dictionary(settings), {
+            'index.number_of_shards': '5',
+            'index.refresh_interval': '1s',
+            'index.merge.policy.segments_per_tier': '10',
+        })
+
+    def test_prefix(self):
+        self.assertEqual(flatten_dictionary({'a': {'b': 1}, 'c': [2]}, prefix='x.'), {'x.a.b': 1, 'x.c': [2]})
+
+
+class CompactRowTests(TestCase):
+
+    def setUp(self):
+        self.conversions = []
+        layout = ResultLayout(('id', 'title', 'views'), (None, None, self.convert))
+        result_class = compact_result_class(SearchResult)
+        self.result = result_class('contenttypes', 'contenttype', '1', 1.5, layout, ['contenttypes.contenttype.1', 'Hello', '3'])
+
+    def convert(self, value):
+        self.conversions.append(value)
+        return int(value)
+
+    def test_class(self):
+        self.assertTrue(compact_result_class(SearchResult) is type(self.result))
+        self.assertTrue(isinstance(self.result, SearchResult))
+
+    def test_lazy_conversion(self):
+        self.assertEqual(self.conversions, [])
+        self.assertEqual(self.result.views, 3)
+        self.assertEqual(self.result.views, 3)
+        self.assertEqual(self.conversions, ['3'])
+        self.assertEqual(self.result.title, 'Hello')
+        self.assertEqual(self.result.get_identifier(), 'contenttypes.contenttype.1')
+
+    def test_set_field(self):
+        self.result._set_field('views', 10)
+        self.assertEqual(self.result.views, 10)
+        self.assertEqual(self.conversions, [])
+        self.result._set_field('extra', 'value')
+        self.assertEqual(self.result.extra, 'value')
+
+    def test_missing_field(self):
+        self.assertRaises(AttributeError, getattr, self.result, 'no_such_field')
+
+    def test_additional_fields(self):
+        self.assertEqual(self.result.get_additional_fields(), {
+            'id': 'contenttypes.contenttype.1',
+            'title': 'Hello',
+            'views': 3,
+        })
+
+    def test_pickle(self):
+        result = pickle.loads(pickle.dumps(self.result, pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(type(result) is SearchResult)
+        self.assertEqual((result.app_label, result.model_name, result.pk, result.score), ('contenttypes', 'contenttype', '1', 1.5))
+        self.assertEqual(result.views, 3)
+        self.assertEqual(result.title, 'Hello')
+
+
+class SearchDeduplicationTests(TestCase):
+
+    def setUp(self):
+        self.deduplication = SearchDeduplication()
+        self.search_kwargs = {'query': {'query_string': {'query': 'news'}}, 'size': 10, 'from': 0}
+
+    def test_inactive(self):
+        self.assertEqual(self.deduplication.make_key('default', ['news'], self.search_kwargs, {}), None)
+
+    def test_make_key(self):
+        with self.deduplication():
+            key = self.deduplication.make_key('default', ['news', 'events'], self.search_kwargs, {'routing': 'a'})
+
+            # The order of index names and dictionary items doesn't matter.
+            search_kwargs = dict(reversed(self.search_kwargs.items()))
+            self.assertEqual(self.deduplication.make_key('default', ['events', 'news'], search_kwargs, {'routing': 'a'}), key)
+
+            self.assertNotEqual(self.deduplication.make_key('other', ['news', 'events'], self.search_kwargs, {'routing': 'a'}), key)
+            self.assertNotEqual(self.deduplication.make_key('default', ['news'], self.search_kwargs, {'routing': 'a'}), key)
+            self.assertNotEqual(self.deduplication.make_key('default', ['news', 'events'], self.search_kwargs, {}), key)
+            self.assertNotEqual(self.deduplication.make_key('default', ['news', 'events'], dict(self.search_kwargs, size=20), {'routing': 'a'}), key)
+
+    def test_copies(self):
+        with self.deduplication():
+            key = self.deduplication.make_key('default', ['news'], self.search_kwargs, {})
+            response = {'hits': {'total': 1, 'hits': [{'_id': '1'}]}}
+            self.deduplication.set(key, response)
+            response['hits']['hits'].append({'_id': '2'})
+
+            duplicate = self.deduplication.get(key)
+            self.assertEqual(duplicate, {'hits': {'total': 1, 'hits': [{'_id': '1'}]}})
+            duplicate['hits']['hits'] = []
+            self.assertEqual(len(self.deduplication.get(key)['hits']['hits']), 1)
+            self.assertEqual(self.deduplication.duplicates, 2)
+
+            self.deduplication.forget()
+            self.assertEqual(self.deduplication.get(key), None)
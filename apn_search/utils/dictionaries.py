@@ -14,3 +14,23 @@ def merge_dictionaries(*dictionaries):
             result[key] = value
 
     return result
+
+
+def flatten_dictionary(dictionary, prefix=''):
+    """
+    Flatten nested dictionaries into one dictionary with dotted keys.
+    For example, {'index': {'refresh_interval': '1s'}} becomes
+    {'index.refresh_interval': '1s'}
+
+    """
+
+    result = {}
+
+    for key, value in dictionary.items():
+        key = prefix + key
+        if isinstance(value, dict):
+            result.update(flatten_dictionary(value, prefix=key + '.'))
+        else:
+            result[key] = value
+
+    return result
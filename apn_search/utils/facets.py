@@ -1,5 +1,9 @@
 from collections import namedtuple
 
+from lazymodel import LazyModel
+
+from apn_search.utils.objects import load_identifiers, wrap_object
+
 
 DateRangeFacet = namedtuple('DateRangeFacet', ('slug', 'label', 'date_range'))
 
@@ -25,3 +29,22 @@ def get_date_facets(facet_counts, date_facets):
         if count:
             facets.append((facet, count))
     return facets
+
+
+def load_facet_values(values, cache_backend=None):
+    """
+    Convert the (identifier, count) values of a ForeignKeyField or
+    ManyToManyField facet into (object, count) values, loading all of
+    the objects in bulk. Missing objects, including those of malformed or
+    outdated identifiers, become LazyModel instances which evaluate as False.
+
+    """
+    objects = load_identifiers([identifier for identifier, count in values], cache_backend)
+    loaded_values = []
+    for identifier, count in values:
+        if identifier in objects:
+            item = wrap_object(objects[identifier])
+        else:
+            item = LazyModel(identifier)
+        loaded_values.append((item, count))
+    return loaded_values
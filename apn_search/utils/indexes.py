@@ -1,4 +1,7 @@
 import inspect
+import threading
+
+from collections import namedtuple
 
 from django.contrib.contenttypes.models import ContentType
 
@@ -6,6 +9,8 @@ from haystack import connections
 
 from lazymodel import LazyModel
 
+from apn_search.results import SearchResult
+
 
 def get_backend():
     return connections['default'].get_backend()
@@ -18,6 +23,53 @@ def get_unified_index(build=False):
     return index
 
 
+IndexedModel = namedtuple('IndexedModel', ('model', 'index', 'result_class'))
+
+
+class ModelTable(dict):
+    """A dictionary which can't be changed after it has been built."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('The model table is shared and cannot be modified.')
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+_model_tables = {}
+_model_tables_lock = threading.Lock()
+
+
+def get_model_table(using='default'):
+    """
+    Get a table of (app_label, model_name) to IndexedModel(model, index,
+    result_class) for every indexed model of a connection. It is built once
+    and then shared, until the unified index is rebuilt, so it is read only.
+
+    This avoids content type, unified index and result class lookups for
+    every search hit.
+
+    """
+
+    indexes = connections[using].get_unified_index().get_indexes()
+
+    table_indexes, table = _model_tables.get(using, (None, None))
+    if table_indexes is not indexes:
+        with _model_tables_lock:
+            rows = {}
+            for model, index in indexes.items():
+                if hasattr(index, 'get_result_class'):
+                    result_class = index.get_result_class()
+                else:
+                    result_class = SearchResult
+                key = (model._meta.app_label, model._meta.object_name.lower())
+                rows[key] = IndexedModel(model, index, result_class)
+            table = ModelTable(rows)
+            _model_tables[using] = (indexes, table)
+
+    return table
+
+
 def get_index(item):
     """Get the haystack index instance for the provided object."""
     model = _get_model(item)
@@ -51,5 +103,9 @@ def _get_model(item):
 
     # Figure out the model from the identifier string.
     app_label, model, object_pk = identifier.split('.', 2)
-    content_type = ContentType.objects.get_by_natural_key(app_label, model)
-    return content_type.model_class()
+    try:
+        return get_model_table()[(app_label, model)].model
+    except KeyError:
+        # Not an indexed model.
+        content_type = ContentType.objects.get_by_natural_key(app_label, model)
+        return content_type.model_class()
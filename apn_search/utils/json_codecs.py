@@ -0,0 +1,112 @@
+"""
+Pluggable JSON codecs, so that a faster JSON library can be used for the
+large request and response bodies of the search engine when it is installed.
+
+Choose one with settings.APN_SEARCH_JSON_CODEC (or the JSON_CODEC option of
+a HAYSTACK connection):
+
+    json        The standard library json module. This is the default.
+    simplejson  simplejson (with its C speedups, when available)
+    ujson       UltraJSON
+    auto        Use the fastest installed codec.
+
+UltraJSON is opt-in because it loses float precision by default, and it
+can't encode custom types. Values which need a default function (e.g. the
+documents sent to the search engine) are encoded by another codec.
+
+"""
+
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class JSONCodec(object):
+    """Uses the standard library json module."""
+
+    name = 'json'
+
+    def dumps(self, value, default=None):
+        return json.dumps(value, default=default)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class SimpleJSONCodec(JSONCodec):
+    """Uses the simplejson library."""
+
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self.module = simplejson
+
+    def dumps(self, value, default=None):
+        return self.module.dumps(value, default=default)
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+
+class UltraJSONCodec(JSONCodec):
+    """
+    Uses the ujson library. It has no support for encoding custom types, so
+    values that need a default function are encoded by another codec.
+
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.module = ujson
+        try:
+            self.fallback = SimpleJSONCodec()
+        except ImportError:
+            self.fallback = JSONCodec()
+
+    def dumps(self, value, default=None):
+        if default is None:
+            return self.module.dumps(value)
+        return self.fallback.dumps(value, default=default)
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+
+# Codecs in order of preference.
+CODECS = (UltraJSONCodec, SimpleJSONCodec, JSONCodec)
+
+_codecs = {}
+
+
+def get_codec(name=None):
+    """
+    Get a JSON codec by name. Defaults to settings.APN_SEARCH_JSON_CODEC,
+    or 'json'. Using 'auto' picks the first codec in CODECS that can be
+    imported.
+
+    """
+
+    if name is None:
+        name = getattr(settings, 'APN_SEARCH_JSON_CODEC', 'json')
+
+    try:
+        return _codecs[name]
+    except KeyError:
+        pass
+
+    for codec_class in CODECS:
+        if name in ('auto', codec_class.name):
+            try:
+                codec = codec_class()
+            except ImportError:
+                if name == 'auto':
+                    continue
+                raise ImproperlyConfigured('The %r JSON codec is not installed.' % name)
+            _codecs[name] = codec
+            return codec
+
+    raise ImproperlyConfigured('Unknown JSON codec %r' % name)
@@ -7,6 +7,10 @@ def get_existing_mapping(using=DEFAULT_ALIAS, index_name=None):
     if index_name is None:
         index_name = backend.index_name
     mappings = backend.conn.get_mapping(indexes=[index_name])
+    if index_name not in mappings and len(mappings) == 1:
+        # The index name is an alias, and the mappings are
+        # keyed by the name of the index behind it.
+        index_name = mappings.keys()[0]
     if backend.new_version:
         # Newer ES versions return everything wrapped in a 'mappings' object.
         # It is kind of redundant for the result of this function, so unwrap it.
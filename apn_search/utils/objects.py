@@ -0,0 +1,160 @@
+"""
+Bulk loading of the database objects behind search results, and behind
+their ForeignKeyField and ManyToManyField values.
+
+Objects are looked up in the cache with a single get_many, and the misses
+are fetched with a single in_bulk query per model. This uses the same cache
+keys and cache backend as LazyModel, so the entries are shared with it and
+are deleted by its signal handlers whenever an object of any model is saved
+or deleted. Objects fetched from the database are added to the cache with
+LazyModel's timeout, unless a read only cache backend is used (see
+apn_search.utils.cache.read_only_cache). The cache keys are only available
+from lazymodel.utils, so this relies on the pinned django-lazycache version.
+
+The loaded objects are given to search results as LazyModel instances, the
+same as when they are loaded one at a time, but already evaluated.
+
+"""
+
+from django.contrib.contenttypes.models import ContentType
+
+from lazymodel import LazyModel
+from lazymodel.backend import lazymodel_cache
+from lazymodel.utils import model_cache_key
+
+from apn_search.fields import ManyToManyManager
+from apn_search.utils.indexes import _get_model
+
+
+def load_objects(model, pks, cache_backend=None):
+    """
+    Load the objects of a model by their primary keys. Returns a dictionary
+    of unicode pk to object. Objects which don't exist are left out.
+
+    """
+
+    if cache_backend is None:
+        cache_backend = lazymodel_cache
+
+    keys = dict((model_cache_key(model, pk), unicode(pk)) for pk in set(pks))
+
+    objects = {}
+    missing = set(keys.values())
+    for key, obj in cache_backend.get_many(keys.keys()).items():
+        missing.discard(keys[key])
+        # LazyModel caches None for objects which don't exist.
+        if obj is not None:
+            objects[keys[key]] = obj
+
+    if missing:
+        for obj in model._default_manager.in_bulk(list(missing)).values():
+            objects[unicode(obj.pk)] = obj
+        cache_backend.set_many(dict(
+            (model_cache_key(model, pk), objects.get(pk))
+            for pk in missing
+        ), lazymodel_cache.default_timeout)
+
+    return objects
+
+
+def wrap_object(obj):
+    """Wrap a loaded object in an already evaluated LazyModel instance."""
+    item = LazyModel(obj)
+    item._wrapped = obj
+    return item
+
+
+def load_identifiers(identifiers, cache_backend=None):
+    """
+    Load objects by their identifier strings, with one lookup per model.
+    Returns a dictionary of identifier to object, leaving out the objects
+    which don't exist, and malformed identifiers or those of models which
+    no longer exist.
+
+    """
+
+    pending = {}
+    for identifier in identifiers:
+        try:
+            app_label, model_name, pk = identifier.split('.', 2)
+            model = _get_model(identifier)
+        except (ValueError, ContentType.DoesNotExist):
+            continue
+        if model is not None:
+            pending.setdefault(model, set()).add(pk)
+
+    objects = {}
+    for model, pks in pending.items():
+        for pk, obj in load_objects(model, pks, cache_backend).items():
+            objects[LazyModel.get_identifier(model, pk)] = obj
+
+    return objects
+
+
+def prefetch_objects(results, cache_backend=None):
+    """
+    Load the objects of search results in bulk, with one lookup per model,
+    and attach them to the results. Results which already have an object
+    are skipped. Results of missing objects are left alone, so their object
+    will still be a LazyModel which evaluates as False.
+
+    """
+
+    pending = {}
+    for result in results:
+        if result is not None and result._object is None:
+            pending.setdefault(result.model, []).append(result)
+
+    for model, model_results in pending.items():
+        objects = load_objects(model, [result.pk for result in model_results], cache_backend)
+        for result in model_results:
+            obj = objects.get(unicode(result.pk))
+            if obj is not None:
+                result._object = wrap_object(obj)
+
+
+def prefetch_related_fields(results, field_names, cache_backend=None):
+    """
+    Load the objects of ForeignKeyField and ManyToManyField values across
+    search results in bulk, with one lookup per model, and replace the lazy
+    objects in the results with evaluated ones. Missing objects are left as
+    they are.
+
+    """
+
+    # Find the lazy objects.
+    values = []
+    identifiers = set()
+    for result in results:
+        if result is None:
+            continue
+        for field_name in field_names:
+            value = result._get_field(field_name)
+            if isinstance(value, ManyToManyManager):
+                items = value._values
+            elif isinstance(value, LazyModel):
+                items = (value,)
+            else:
+                continue
+            for item in items:
+                if isinstance(item, LazyModel):
+                    identifiers.add(LazyModel.get_identifier(item))
+            values.append((result, field_name, value))
+
+    if not values:
+        return
+
+    objects = load_identifiers(identifiers, cache_backend)
+
+    def resolve(item):
+        if isinstance(item, LazyModel):
+            obj = objects.get(LazyModel.get_identifier(item))
+            if obj is not None:
+                return wrap_object(obj)
+        return item
+
+    for result, field_name, value in values:
+        if isinstance(value, ManyToManyManager):
+            result._set_field(field_name, ManyToManyManager(*[resolve(item) for item in value._values]))
+        else:
+            result._set_field(field_name, resolve(value))
@@ -3,13 +3,52 @@ from apn_search.query import SearchQuerySet
 from apn_search.utils.indexes import get_index, get_unified_index
 
 
+_model_searches = {}
+
+
 def model_search(*models):
-    """Create the basic combined search for the specified models."""
+    """
+    Create the basic combined search for the specified models.
+
+    When the indexes of all of the models have cacheable_filters enabled,
+    the search is built once for each combination of models, and copies of
+    it are returned until the unified index is rebuilt or the searches are
+    cleared with clear_model_searches(). Otherwise it is built every time,
+    so that the filters() of the indexes can change between calls.
+
+    """
+
+    indexes = get_unified_index().get_indexes()
+
+    cacheable = all(
+        getattr(indexes.get(model), 'cacheable_filters', False)
+        for model in models or indexes
+    )
+    if not cacheable:
+        return build_model_search(models or indexes.keys())
+
+    search_indexes, search = _model_searches.get(models, (None, None))
+    if search_indexes is not indexes:
+        search = build_model_search(models or indexes.keys())
+        _model_searches[models] = (indexes, search)
+
+    return search._clone()
+
+
+def clear_model_searches():
+    """Forget the searches built by model_search, so they are built again."""
+    _model_searches.clear()
+
+
+def build_model_search(models):
+    """
+    Build the basic combined search for the specified models. When filters
+    are compiled (see backends.filters), the filters of their indexes are
+    compiled into a single filter clause, which will be shared by every
+    search that is derived from this one, leaving the query string for
+    their own criteria.
 
-    if not models:
-        index = get_unified_index()
-        index.build()
-        models = index.indexes.keys()
+    """
 
     search = SearchQuerySet().models(*models)
 
@@ -21,5 +60,16 @@ def model_search(*models):
             filters[lookup] = Optional(value)
     if filters:
         search = search.filter(**filters)
+        if search.query.use_compiled_filters():
+            query_filter, base_filter = search.query.split_filters()
+            if base_filter:
+                base_node = search.query.query_filter
+                if query_filter.children:
+                    # Keep only the filters that were compiled.
+                    compiled = [child for child in base_node.children if child not in query_filter.children]
+                    base_node = base_node.__class__()
+                    base_node.children = compiled
+                search.query.query_filter = query_filter
+                search.query.set_base_filter(base_filter, base_node)
 
     return search
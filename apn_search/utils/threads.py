@@ -0,0 +1,104 @@
+import Queue
+import sys
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+
+class _Finished(object):
+    """Placed on the buffer when a worker thread has run out of work."""
+
+
+class _Failed(object):
+    """Placed on the buffer when a worker thread has raised an exception."""
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
+def merge_iterators(iterator_factories, workers=4, buffer_size=1000):
+    """
+    Consume iterators in worker threads, merging their items into a single
+    iterator. The order of items is not preserved.
+
+    Each factory is called (in a worker thread) to create an iterator. The
+    buffer between the workers and the consumer holds at most buffer_size
+    items, so workers will wait when the consumer falls behind.
+
+    Closing the returned generator stops the workers, and closes their
+    current iterators so they can clean up after themselves.
+
+    """
+
+    tasks = Queue.Queue()
+    for factory in iterator_factories:
+        tasks.put(factory)
+
+    output = Queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+
+    def put(item):
+        # Keep trying until there is room, unless the consumer goes away.
+        while not stopped.is_set():
+            try:
+                output.put(item, timeout=0.1)
+            except Queue.Full:
+                continue
+            else:
+                return True
+        return False
+
+    def work():
+        try:
+            while not stopped.is_set():
+                try:
+                    factory = tasks.get_nowait()
+                except Queue.Empty:
+                    break
+                iterator = iter(factory())
+                try:
+                    for item in iterator:
+                        if not put(item):
+                            break
+                finally:
+                    if hasattr(iterator, 'close'):
+                        iterator.close()
+        except Exception:
+            put(_Failed(sys.exc_info()))
+        else:
+            put(_Finished)
+
+    threads = []
+    for number in range(min(workers, tasks.qsize())):
+        thread = threading.Thread(target=work, name='merge_iterators-%d' % number)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    try:
+        running = len(threads)
+        while running:
+            item = output.get()
+            if item is _Finished:
+                running -= 1
+            elif isinstance(item, _Failed):
+                raise item.exc_info[0], item.exc_info[1], item.exc_info[2]
+            else:
+                yield item
+    finally:
+        stopped.set()
+        for thread in threads:
+            thread.join()
+
+
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+
+
+def get_thread_pool(name, size):
+    """Get a shared, bounded pool of worker threads."""
+    with _thread_pools_lock:
+        pool = _thread_pools.get(name)
+        if pool is None:
+            pool = _thread_pools[name] = ThreadPool(size)
+        return pool
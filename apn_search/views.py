@@ -1,9 +1,8 @@
-import json
-
 from django.http import HttpResponse, HttpResponseBadRequest
 
 from apn_search.query import EmptySearchQuerySet
 from apn_search.utils import regex
+from apn_search.utils.json_codecs import get_codec
 
 
 class TypeAheadView(object):
@@ -47,7 +46,8 @@ class TypeAheadView(object):
                 assert limit > 0
             except Exception:
                 limit = self.default_limit
-            search = search[:limit]
+            # Only fetch the fields that are used.
+            search = search.only_fields(search_field, return_field)[:limit]
 
         else:
             search = EmptySearchQuerySet()
@@ -60,7 +60,7 @@ class TypeAheadView(object):
             if name and value:
                 data[name] = value
 
-        json_data = json.dumps(data)
+        json_data = get_codec().dumps(data)
 
         return HttpResponse(json_data, content_type='application/json')
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Compare search latency with filters in the query string (before) and with
+filters compiled into filter clauses (after).
+
+Usage:
+
+    DJANGO_SETTINGS_MODULE=myproject.settings python benchmarks/compiled_filters.py [field=value ...]
+
+    python benchmarks/compiled_filters.py is_live=True section__in=news,sport created__gte=2014-01-01
+    python benchmarks/compiled_filters.py author=optional:auth.user.1
+
+Values containing commas become lists, and the "optional:" prefix wraps
+a value with Optional. This needs a configured project and a running
+Elasticsearch with indexed data. Each mode is run once to warm up the
+caches before it is measured.
+
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apn_search.inputs import Optional
+from apn_search.query import SearchQuerySet
+
+
+def parse_value(value):
+    if value.startswith('optional:'):
+        return Optional(parse_value(value[len('optional:'):]))
+    if ',' in value:
+        return value.split(',')
+    if value in ('True', 'False'):
+        return value == 'True'
+    return value
+
+
+def parse_filters(args):
+    filters = {}
+    for arg in args:
+        name, value = arg.split('=', 1)
+        filters[name] = parse_value(value)
+    return filters
+
+
+def measure(queryset, repeat):
+    timings = []
+    for number in range(repeat + 1):
+        started = time.time()
+        list(queryset.all()[:20])
+        timings.append(time.time() - started)
+    timings = sorted(timings[1:])
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+
+def main(args, repeat=100):
+
+    queryset = SearchQuerySet().filter(**parse_filters(args))
+
+    print 'Query string: %s' % queryset.compile_filters().query.build_query()
+    print 'Filter: %s' % queryset.compile_filters().query.split_filters()[1]
+    print
+
+    for name, mode_queryset in (('before', queryset.compile_filters(False)), ('after', queryset.compile_filters())):
+        median, p95 = measure(mode_queryset, repeat)
+        print '%-8s median %7.2fms  p95 %7.2fms' % (name, median * 1000, p95 * 1000)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Measure the per-hit cost of SearchQuerySet.create_result, comparing the
+model table lookup with the previous content type and unified index lookups.
+
+Usage:
+
+    DJANGO_SETTINGS_MODULE=myproject.settings python benchmarks/create_result.py [number_of_hits] [repeat]
+
+This needs a configured project with registered search indexes and a
+database containing their content types. No search requests are made.
+
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.contrib.contenttypes.models import ContentType
+
+from haystack import connections
+
+from apn_search.query import SearchQuerySet
+from apn_search.results import SearchResult
+from apn_search.utils.indexes import get_model_table
+
+
+def legacy_create_result(queryset, app_label, model_name, pk, score, **kwargs):
+    """How create_result worked before the model table."""
+
+    content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
+
+    unified_index = connections[queryset.query._using].get_unified_index()
+    index = unified_index.get_index(content_type.model_class())
+
+    if hasattr(index, 'get_result_class'):
+        result_class = index.get_result_class()
+    else:
+        result_class = SearchResult
+
+    return result_class(app_label, model_name, pk, score, **kwargs)
+
+
+def make_hits(hits):
+    keys = sorted(get_model_table())
+    if not keys:
+        raise SystemExit('No search indexes are registered.')
+    return [
+        (keys[number % len(keys)], str(number), 1.0)
+        for number in range(hits)
+    ]
+
+
+def main(hits=1000, repeat=20):
+
+    queryset = SearchQuerySet()
+    page = make_hits(hits)
+
+    def legacy():
+        for (app_label, model_name), pk, score in page:
+            legacy_create_result(queryset, app_label, model_name, pk, score)
+
+    def table():
+        for (app_label, model_name), pk, score in page:
+            queryset.create_result(app_label, model_name, pk, score)
+
+    # Warm up the content type cache and the model table.
+    legacy()
+    table()
+
+    print 'Page of %d hits over %d models' % (hits, len(get_model_table()))
+    print
+
+    for name, function in (('legacy', legacy), ('table', table)):
+        seconds = min(timeit.repeat(function, number=repeat, repeat=3)) / repeat
+        print '%-8s %8.3fms per page  %6.2fus per hit' % (name, seconds * 1000, seconds * 1000000 / hits)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
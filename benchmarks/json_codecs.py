@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Compare the JSON codecs on realistic search engine payloads.
+
+Usage:
+
+    python benchmarks/json_codecs.py [number_of_hits] [repeat]
+
+The payload is modelled on a search response for a story index, where each
+hit has a large rendered document field and several smaller stored fields.
+
+"""
+
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apn_search.utils.json_codecs import CODECS, get_codec
+
+
+def random_text(words):
+    return ' '.join(
+        ''.join(random.choice(string.ascii_lowercase) for i in range(random.randint(2, 10)))
+        for i in range(words)
+    )
+
+
+def make_response(hits):
+    return {
+        'took': 12,
+        'timed_out': False,
+        '_shards': {'total': 5, 'successful': 5, 'failed': 0},
+        'hits': {
+            'total': hits * 20,
+            'max_score': 1.0,
+            'hits': [
+                {
+                    '_index': 'haystack-news-story-2',
+                    '_type': 'modelresult',
+                    '_id': 'news.story.%d' % number,
+                    '_score': 1.0,
+                    '_source': {
+                        'id': 'news.story.%d' % number,
+                        'django_ct': 'news.story',
+                        'django_id': str(number),
+                        'text': random_text(800),
+                        'title': random_text(10),
+                        'summary': random_text(40),
+                        'author': 'auth.user.%d' % random.randint(1, 500),
+                        'tags': ['tags.tag.%d' % random.randint(1, 5000) for i in range(8)],
+                        'created': '2014-03-%02dT10:30:00' % random.randint(1, 28),
+                        'is_live': True,
+                        'geoposition': '-27.4581498,151.9491543',
+                    },
+                }
+                for number in range(hits)
+            ],
+        },
+    }
+
+
+def main(hits=50, repeat=200):
+
+    response = make_response(hits)
+    encoded = get_codec('json').dumps(response)
+
+    print 'Payload: %d hits, %d bytes' % (hits, len(encoded))
+    print
+
+    for codec_class in CODECS:
+
+        try:
+            codec = get_codec(codec_class.name)
+        except Exception:
+            print '%-12s not installed' % codec_class.name
+            continue
+
+        dumps = min(timeit.repeat(lambda: codec.dumps(response), number=repeat, repeat=3)) / repeat
+        loads = min(timeit.repeat(lambda: codec.loads(encoded), number=repeat, repeat=3)) / repeat
+
+        print '%-12s dumps %7.3fms  loads %7.3fms' % (codec.name, dumps * 1000, loads * 1000)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
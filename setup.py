@@ -16,7 +16,7 @@ setup(
     install_requires=(
         'django >= 1.2.0, < 1.3.0',
         'django-haystack == 2.0.0-beta-apn-online-0.4',
-        'django-lazycache',
+        'django-lazycache == 0.0.1',
         'python-mq',
     ),
 )